@@ -0,0 +1,64 @@
+"""
+Compare loading an engine for every PDF with borrowing engines from a warm pool.
+Uses the stub engine backend, so it runs on any platform without ABBYY installed.
+
+    python devCode/benchmarks/bench_abbyy_engine_pool.py --files 20 --pool-size 2
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converter_modules.abbyy_integration.abby_pdf_to_docx import EnginePool, StubEngineBackend
+
+
+def convert_with_engine_per_file(backend, jobs):
+    """The previous behaviour: load, convert and unload for every file."""
+    for file_path, output_path in jobs:
+        engine = backend.load_engine()
+        try:
+            backend.convert(engine, file_path, output_path)
+        finally:
+            backend.unload_engine(engine)
+
+
+def convert_with_pool(backend, jobs, pool_size):
+    pool = EnginePool(backend, pool_size)
+    try:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            list(executor.map(lambda job: pool.convert(*job), jobs))
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--pool-size', type=int, default=2)
+    parser.add_argument('--load-latency', type=float, default=2.0, help='seconds to start one engine')
+    parser.add_argument('--convert-latency', type=float, default=0.5, help='seconds to convert one file')
+    args = parser.parse_args()
+
+    backend = StubEngineBackend(args.load_latency, args.convert_latency)
+    work_dir = tempfile.mkdtemp()
+    jobs = [(f'input_{n}.pdf', os.path.join(work_dir, f'output_{n}.docx')) for n in range(args.files)]
+
+    start = time.perf_counter()
+    convert_with_engine_per_file(backend, jobs)
+    per_file_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    convert_with_pool(backend, jobs, args.pool_size)
+    pool_seconds = time.perf_counter() - start
+
+    print(f'{args.files} files, load {args.load_latency}s, convert {args.convert_latency}s')
+    print(f'engine per file : {per_file_seconds:8.2f}s')
+    print(f'pool of {args.pool_size:<8}: {pool_seconds:8.2f}s ({per_file_seconds / pool_seconds:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
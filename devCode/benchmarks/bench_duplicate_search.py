@@ -0,0 +1,86 @@
+"""
+Compare the previous fuzzywuzzy window scoring of the CO duplicate search with the batched rapidfuzz
+scoring of find_duplicate_window, on a synthetic AFT bundle with repeated rule sections.
+
+    python devCode/benchmarks/bench_duplicate_search.py --sections 40 --copies 3
+"""
+import io
+import os
+import sys
+import time
+import argparse
+from random import Random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from fuzzywuzzy import fuzz
+from core_components.jurisdictions.co import co_aft
+from core_components.jurisdictions.co.paragraph_index import ParagraphIndex
+
+BODY_PARAGRAPHS = 12
+WORDS = ('permit', 'emission', 'hearing', 'variance', 'notice', 'source', 'ozone', 'county', 'fee',
+         'inspection', 'appeal', 'standard', 'control', 'report', 'operator', 'facility', 'exemption')
+
+
+def build_document(sections, copies):
+    """Return the bytes of a bundle where every rule section is repeated copies times."""
+    doc = Document()
+    random = Random(0)
+    bodies = [[' '.join(random.choice(WORDS) for _ in range(40)) for _ in range(BODY_PARAGRAPHS)] for _ in range(sections)]
+    for copy in range(copies):
+        for number in range(sections):
+            doc.add_paragraph(f'Title of Rule:\tRule {number} concerning air quality permits')
+            doc.add_paragraph(f'Rule Number:\t5 CCR 1001-{number}')
+            doc.add_paragraph('Rulemaking Agency:\tDepartment of Public Health and Environment')
+            for line, text in enumerate(bodies[number]):
+                doc.add_paragraph(f'Section {number}.{line} {text}')
+            doc.add_paragraph(f'Division / Contact / Phone:\tAPCD / Contact {number} / 303-692-{number:04d}')
+            doc.add_paragraph('SECRETARY OF STATE')
+    stream = io.BytesIO()
+    doc.save(stream)
+    return stream.getvalue()
+
+
+def find_duplicate_window_fuzzywuzzy(search_text, match_text, window_texts):
+    """The previous behaviour: grow the joined text one paragraph at a time and score it with fuzzywuzzy."""
+    match_text = list(match_text)
+    for offset, text in enumerate(window_texts):
+        match_text.append(text)
+        if fuzz.ratio(search_text, ''.join(match_text)) > 95:
+            return offset
+    return None
+
+
+def time_duplicate_search(content, doc_type):
+    doc = Document(io.BytesIO(content))
+    paragraphs = ParagraphIndex(doc)
+    start = time.perf_counter()
+    co_aft.remove_duplicate_paragraphs_in_document(doc, doc_type, paragraphs)
+    return time.perf_counter() - start, paragraphs.texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sections', type=int, default=40)
+    parser.add_argument('--copies', type=int, default=3)
+    args = parser.parse_args()
+
+    content = build_document(args.sections, args.copies)
+
+    batched_window = co_aft.find_duplicate_window
+    co_aft.find_duplicate_window = find_duplicate_window_fuzzywuzzy
+    try:
+        fuzzywuzzy_seconds, fuzzywuzzy_texts = time_duplicate_search(content, 'TYPE 1')
+    finally:
+        co_aft.find_duplicate_window = batched_window
+    rapidfuzz_seconds, rapidfuzz_texts = time_duplicate_search(content, 'TYPE 1')
+
+    print(f'{args.sections} sections x {args.copies} copies, {len(fuzzywuzzy_texts)} paragraphs left')
+    print(f'fuzzywuzzy windows : {fuzzywuzzy_seconds:8.2f}s')
+    print(f'rapidfuzz batches  : {rapidfuzz_seconds:8.2f}s ({fuzzywuzzy_seconds / rapidfuzz_seconds:.1f}x)')
+    print(f'identical output   : {fuzzywuzzy_texts == rapidfuzz_texts}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Time the single lxml walk of apply_document_formatting, in direct and style mode, on a synthetic
+document shaped like ABBYY output.
+
+    python devCode/benchmarks/bench_generic_formatting.py --pages 500
+"""
+import io
+import os
+import sys
+import time
+import zipfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from docx import Document
+from docx.shared import Pt
+from core_components.generic_instruction.generic_instructions import apply_document_formatting
+
+PARAGRAPHS_PER_PAGE = 12
+RUNS_PER_PARAGRAPH = 4
+
+
+def build_document(pages):
+    """Return the bytes of a document with short, separately formatted runs and a table every page."""
+    doc = Document()
+    words = 'The "Commission" shall publish the rule at www.example.gov within thirty days of adoption'.split()
+    for page in range(pages):
+        for number in range(PARAGRAPHS_PER_PAGE):
+            paragraph = doc.add_paragraph()
+            paragraph.paragraph_format.left_indent = Pt(18)
+            for run_number in range(RUNS_PER_PARAGRAPH):
+                start = (number + run_number) % len(words)
+                run = paragraph.add_run(' '.join(words[start:start + 4]) + ' ')
+                run.font.name = 'Arial'
+                run.font.size = Pt(10 + run_number)
+        table = doc.add_table(rows=2, cols=3)
+        for cell in table._cells:
+            cell.text = f"Section {page}, 'amended'"
+    stream = io.BytesIO()
+    doc.save(stream)
+    return stream.getvalue()
+
+
+def time_formatting(func, doc, **kwargs):
+    start = time.perf_counter()
+    func(doc, **kwargs)
+    return time.perf_counter() - start
+
+
+def document_xml_size(doc):
+    stream = io.BytesIO()
+    doc.save(stream)
+    return len(zipfile.ZipFile(stream).read('word/document.xml'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=500)
+    args = parser.parse_args()
+
+    content = build_document(args.pages)
+
+    fused_doc = Document(io.BytesIO(content))
+    fused_seconds = time_formatting(apply_document_formatting, fused_doc)
+
+    # A second run finds every run already conforming
+    rerun_seconds = time_formatting(apply_document_formatting, fused_doc)
+
+    style_doc = Document(io.BytesIO(content))
+    style_seconds = time_formatting(apply_document_formatting, style_doc, mode='style')
+
+    print(f'{args.pages} pages, {args.pages * PARAGRAPHS_PER_PAGE} paragraphs, {args.pages} tables')
+    print(f'single walk      : {fused_seconds:8.2f}s')
+    print(f'conforming rerun : {rerun_seconds:8.2f}s')
+    print(f'style mode       : {style_seconds:8.2f}s')
+    print(f'document.xml     : {document_xml_size(fused_doc):,} bytes direct, {document_xml_size(style_doc):,} bytes style')
+
+
+if __name__ == '__main__':
+    main()
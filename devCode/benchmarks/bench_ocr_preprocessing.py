@@ -0,0 +1,116 @@
+"""
+Compare OCR time and accuracy on raw images with the preprocessing settings of image_preprocessing,
+on synthetic colour letterheads or on a folder of images with the expected text in a .txt file of the
+same name. Needs tesseract, through tesserocr or pytesseract (--engine).
+
+    python devCode/benchmarks/bench_ocr_preprocessing.py --images 20
+    python devCode/benchmarks/bench_ocr_preprocessing.py --corpus C:\\File\\NETSCAN\\ocr_samples
+    python devCode/benchmarks/bench_ocr_preprocessing.py --engine pytesseract
+"""
+import os
+import sys
+import time
+import argparse
+from random import Random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from rapidfuzz import fuzz
+from common_func.image_preprocessing import preprocess_for_ocr
+from converter_modules.ocr_integration.ocr_engine import get_ocr_backend
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.gif')
+
+SETTINGS = [
+    ('raw', None),
+    ('grayscale + 300 dpi', {'target_dpi': 300}),
+    ('grayscale + 200 dpi', {'target_dpi': 200}),
+    ('binarize', {'target_dpi': 300, 'binarize': True}),
+    ('binarize + crop', {'target_dpi': 300, 'binarize': True, 'crop_text_band': True}),
+]
+
+HEADERS = [
+    'STATE OF COLORADO',
+    'Department of Public Health and Environment',
+    'Air Pollution Control Division',
+    'Colorado Department of Regulatory Agencies',
+    'Office of Policy, Research and Regulatory Reform',
+]
+
+
+def build_letterhead(random):
+    """A colour letterhead at 300 or 600 DPI on a shaded, slightly noisy background, with its text."""
+    dpi = random.choice((300, 600))
+    scale = dpi // 300
+    lines = random.sample(HEADERS, 2)
+    image = Image.new('RGB', (2550 * scale, 450 * scale), (random.randint(215, 250), random.randint(225, 250), 250))
+    draw = ImageDraw.Draw(image)
+    for x in range(0, image.width, 6 * scale):
+        shade = 200 + (x // scale) % 40
+        draw.line((x, 0, x, image.height), fill=(shade, shade + 10, 245), width=2 * scale)
+    draw.ellipse((60 * scale, 60 * scale, 360 * scale, 360 * scale), outline=(20, 60, 140), width=14 * scale)
+    y = 100 * scale
+    for line, size in zip(lines, (80, 52)):
+        draw.text((450 * scale, y), line, fill=(random.randint(0, 60), 40, 120), font=ImageFont.load_default(size=size * scale))
+        y += (size + 60) * scale
+    image = image.filter(ImageFilter.GaussianBlur(0.6 * scale))
+    image.info['dpi'] = (dpi, dpi)
+    return image, '\n'.join(lines)
+
+
+def load_corpus(corpus):
+    samples = []
+    for name in sorted(os.listdir(corpus)):
+        base, extension = os.path.splitext(name)
+        truth_path = os.path.join(corpus, base + '.txt')
+        if extension.lower() in IMAGE_EXTENSIONS and os.path.exists(truth_path):
+            image = Image.open(os.path.join(corpus, name))
+            image.load()
+            with open(truth_path, encoding='utf-8') as truth:
+                samples.append((image, truth.read()))
+    return samples
+
+
+def accuracy(text, expected):
+    """Similarity (0-100) of the OCR text to the expected text, ignoring line breaks and spacing."""
+    return fuzz.ratio(' '.join(text.split()), ' '.join(expected.split()))
+
+
+def run_setting(backend, samples, options):
+    seconds = 0.0
+    scores = []
+    for image, expected in samples:
+        start = time.perf_counter()
+        ocr_image = preprocess_for_ocr(image, **options) if options is not None else image
+        text = backend.image_to_string(ocr_image)
+        seconds += time.perf_counter() - start
+        scores.append(accuracy(text, expected))
+    return seconds, sum(scores) / len(scores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', type=int, default=20, help='number of synthetic letterheads')
+    parser.add_argument('--corpus', help='folder of images with the expected text in <name>.txt')
+    parser.add_argument('--engine', default='auto', choices=('auto', 'tesserocr', 'pytesseract'))
+    args = parser.parse_args()
+
+    if args.corpus:
+        samples = load_corpus(args.corpus)
+    else:
+        random = Random(0)
+        samples = [build_letterhead(random) for _ in range(args.images)]
+    if not samples:
+        parser.error('no samples found')
+
+    backend = get_ocr_backend(args.engine)
+    print(f'{len(samples)} images, {backend.name} ({backend.version()})')
+    print(f'{"setting":<24}{"seconds":>10}{"per image":>12}{"accuracy":>10}')
+    for name, options in SETTINGS:
+        seconds, mean_accuracy = run_setting(backend, samples, options)
+        print(f'{name:<24}{seconds:>10.2f}{seconds / len(samples) * 1000:>10.0f}ms{mean_accuracy:>9.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+try:
+    import pythoncom
+except ImportError:      # not on Windows: stub/fake backends do not need COM initialisation
+    pythoncom = None
+
+
+class ComWorker:
+    """
+    A dedicated thread that owns COM objects and runs every call made against them.
+    COM objects belong to the apartment of the thread that created them, so an engine or Word
+    session is created, used and released on its own worker thread.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        if pythoncom is not None:
+            pythoncom.CoInitialize()
+        try:
+            while True:
+                item = self._calls.get()
+                if item is None:
+                    break
+                future, func, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) on the worker thread and return a Future for its result."""
+        future = Future()
+        self._calls.put((future, func, args, kwargs))
+        return future
+
+    def call(self, func, *args, timeout=None, **kwargs):
+        """Run func on the worker thread and wait for the result; raises TimeoutError after timeout seconds."""
+        return self.submit(func, *args, **kwargs).result(timeout=timeout)
+
+    def stop(self):
+        """Let the thread finish its queued calls and exit."""
+        self._calls.put(None)
+
+    def is_alive(self):
+        return self._thread.is_alive()
@@ -0,0 +1,39 @@
+import time
+from docx import Document
+from logs.logs_handler import get_logger
+
+logger = get_logger(__name__)
+
+
+class DocumentPassManager:
+    """
+    Load a DOCX file once, run the registered passes on the in-memory document and save it once.
+
+    A pass is a callable taking the python-docx Document as its first argument. It returns False when
+    it left the document untouched; any other return value (including None) marks the document dirty.
+    The file is only written back when at least one pass changed the document.
+    """
+
+    def __init__(self, doc_path):
+        self.doc_path = doc_path
+        self.passes = []
+
+    def register(self, name, func, *args, **kwargs):
+        """Add a pass; passes run in registration order with func(doc, *args, **kwargs)."""
+        self.passes.append((name, func, args, kwargs))
+
+    def run(self):
+        """Run every pass on a single loaded copy of the document and return the document."""
+        doc = Document(self.doc_path)
+        dirty = False
+
+        for name, func, args, kwargs in self.passes:
+            start = time.perf_counter()
+            changed = func(doc, *args, **kwargs)
+            dirty = dirty or changed is not False
+            logger.info(f"Pass '{name}' finished in {time.perf_counter() - start:.2f}s (changed={changed is not False})")
+
+        if dirty:
+            doc.save(self.doc_path)
+            logger.info(f"Saved document after {len(self.passes)} passes: {self.doc_path}")
+        return doc
@@ -0,0 +1,266 @@
+import io
+import re
+import copy
+import posixpath
+from docx import Document
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.part import Part, PartFactory, XmlPart
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.parts.numbering import NumberingPart
+from logs.logs_handler import get_logger
+
+logger = get_logger(__name__)
+
+RELATIONSHIP_ATTRIBUTES = (qn('r:id'), qn('r:embed'), qn('r:link'))
+STYLE_REFERENCES = (qn('w:pStyle'), qn('w:rStyle'), qn('w:tblStyle'), qn('w:basedOn'), qn('w:next'), qn('w:link'))
+SECTION_REFERENCES = (qn('w:headerReference'), qn('w:footerReference'))
+BOOKMARK_TAGS = (qn('w:bookmarkStart'), qn('w:bookmarkEnd'))
+DRAWING_ID_TAG = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}docPr'
+WORD_VALUE = qn('w:val')
+WORD_ID = qn('w:id')
+NOTE_TYPES = (
+    (RT.FOOTNOTES, qn('w:footnote'), qn('w:footnoteReference'), '/word/footnotes%d.xml'),
+    (RT.ENDNOTES, qn('w:endnote'), qn('w:endnoteReference'), '/word/endnotes%d.xml'),
+)
+# Separators are part of every notes part and are not copied
+SEPARATOR_NOTES = ('separator', 'continuationSeparator', 'continuationNotice')
+
+# Load footnotes and endnotes as XML, so the notes of appended documents can be added to them
+for _content_type in (CT.WML_FOOTNOTES, CT.WML_ENDNOTES):
+    PartFactory.part_type_for.setdefault(_content_type, XmlPart)
+
+
+def numbering_element(document):
+    try:
+        return document.part.part_related_by(RT.NUMBERING).element
+    except KeyError:
+        return None
+
+
+def max_int_attribute(root, tag, attribute):
+    values = [int(element.get(attribute)) for element in root.iter(tag) if (element.get(attribute) or '').isdigit()]
+    return max(values, default=0)
+
+
+class DocxMerger:
+    """
+    Appends whole documents to a DOCX, each starting a new section. Styles, list numbering, footnotes, images
+    and other related parts of the appended documents are carried over; a style whose id is taken by a different
+    definition is renamed, and list, note, bookmark and drawing ids are renumbered so they stay unique.
+    Headers and footers are those of the first document.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.body = document.element.body
+        self.body.get_or_add_sectPr()
+        self.section_references = [copy.deepcopy(reference) for reference in self.body.sectPr
+                                   if reference.tag in SECTION_REFERENCES]
+        self.next_bookmark_id = max_int_attribute(self.body, qn('w:bookmarkStart'), WORD_ID) + 1
+        self.next_drawing_id = max_int_attribute(self.body, DRAWING_ID_TAG, 'id') + 1
+        self.appended = 0
+
+    def append(self, source):
+        """Append the body of the source document after a section break."""
+        self.appended += 1
+        number_ids = self.merge_numbering(source)
+        style_ids = self.merge_styles(source, number_ids)
+        note_ids = self.merge_notes(source)
+
+        related = {}
+        bookmark_ids = {}
+        elements = [copy.deepcopy(element) for element in source.element.body if element.tag != qn('w:sectPr')]
+        final_section = copy.deepcopy(source.element.body.sectPr if source.element.body.sectPr is not None else self.body.sectPr)
+        for element in elements + [final_section]:
+            self.remap(element, source.part, related, style_ids, number_ids, bookmark_ids, note_ids)
+
+        self.add_section_break()
+        for element in elements:
+            self.body.sectPr.addprevious(element)
+        self.body.replace(self.body.sectPr, final_section)
+
+    def add_section_break(self):
+        """End the current content with a section carrying the current final section properties."""
+        section = copy.deepcopy(self.body.sectPr)
+        last = self.body.sectPr.getprevious()
+        if last is None or last.tag != qn('w:p') or last.find(qn('w:pPr') + '/' + qn('w:sectPr')) is not None:
+            last = OxmlElement('w:p')
+            self.body.sectPr.addprevious(last)
+        last.get_or_add_pPr().append(section)
+
+    def remap(self, root, source_part, related, style_ids, number_ids, bookmark_ids, note_ids):
+        """Point the copied content at this document's relationships, styles, lists and ids."""
+        for element in root.iter():
+            for attribute in RELATIONSHIP_ATTRIBUTES:
+                if attribute in element.attrib and element.tag not in SECTION_REFERENCES:
+                    element.set(attribute, self.relate(source_part, element.get(attribute), related))
+            if element.tag in STYLE_REFERENCES and element.get(WORD_VALUE) in style_ids:
+                element.set(WORD_VALUE, style_ids[element.get(WORD_VALUE)])
+            elif element.tag == qn('w:numId') and element.get(WORD_VALUE) in number_ids:
+                element.set(WORD_VALUE, number_ids[element.get(WORD_VALUE)])
+            elif element.tag in BOOKMARK_TAGS and element.get(WORD_ID) is not None:
+                old_id = element.get(WORD_ID)
+                if old_id not in bookmark_ids:
+                    bookmark_ids[old_id] = str(self.next_bookmark_id)
+                    self.next_bookmark_id += 1
+                element.set(WORD_ID, bookmark_ids[old_id])
+            elif element.tag in note_ids and element.get(WORD_ID) in note_ids[element.tag]:
+                element.set(WORD_ID, note_ids[element.tag][element.get(WORD_ID)])
+            elif element.tag == DRAWING_ID_TAG:
+                element.set('id', str(self.next_drawing_id))
+                self.next_drawing_id += 1
+
+        sections = [root] if root.tag == qn('w:sectPr') else list(root.iter(qn('w:sectPr')))
+        for section in sections:
+            for reference in section.findall('*'):
+                if reference.tag in SECTION_REFERENCES:
+                    section.remove(reference)
+            for reference in reversed(self.section_references):
+                section.insert(0, copy.deepcopy(reference))
+
+    def relate(self, source_part, rel_id, related):
+        """Return this document's relationship id for the target of rel_id in the source part."""
+        if rel_id in related:
+            return related[rel_id]
+        rel = source_part.rels.get(rel_id)
+        if rel is None:
+            return rel_id
+        part = self.document.part
+        if rel.is_external:
+            new_id = part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+        elif rel.reltype == RT.IMAGE:
+            new_id, _ = part.get_or_add_image(io.BytesIO(rel.target_part.blob))
+        else:
+            target = rel.target_part
+            name, extension = posixpath.splitext(target.partname)
+            partname = part.package.next_partname(re.sub(r'\d*$', '', name) + '%d' + extension)
+            if target.rels:
+                logger.warning(f'Relationships of {target.partname} are not carried over to {partname}')
+            new_id = part.relate_to(Part(partname, target.content_type, target.blob, part.package), rel.reltype)
+        related[rel_id] = new_id
+        return new_id
+
+    def merge_numbering(self, source):
+        """Copy the list definitions of the source under new ids; returns {source numId: new numId}."""
+        source_numbering = numbering_element(source)
+        if source_numbering is None or source_numbering.find(qn('w:num')) is None:
+            return {}
+        numbering = numbering_element(self.document)
+        if numbering is None:
+            numbering_part = NumberingPart.load(
+                part_name=self.document.part.package.next_partname('/word/numbering%d.xml'),
+                content_type=source.part.part_related_by(RT.NUMBERING).content_type,
+                blob=source.part.part_related_by(RT.NUMBERING).blob,
+                package=self.document.part.package,
+            )
+            self.document.part.relate_to(numbering_part, RT.NUMBERING)
+            return {}
+
+        abstract_tag, abstract_id = qn('w:abstractNum'), qn('w:abstractNumId')
+        next_abstract_id = max_int_attribute(numbering, abstract_tag, abstract_id) + 1
+        next_number_id = max_int_attribute(numbering, qn('w:num'), qn('w:numId')) + 1
+        abstract_ids = {}
+        first_number = numbering.find(qn('w:num'))
+        for abstract in source_numbering.findall(abstract_tag):
+            abstract = copy.deepcopy(abstract)
+            abstract_ids[abstract.get(abstract_id)] = str(next_abstract_id)
+            abstract.set(abstract_id, str(next_abstract_id))
+            # The unique list id would make Word join the lists of the two documents
+            for nsid in abstract.findall(qn('w:nsid')):
+                abstract.remove(nsid)
+            next_abstract_id += 1
+            if first_number is not None:
+                first_number.addprevious(abstract)
+            else:
+                numbering.append(abstract)
+
+        number_ids = {}
+        for number in source_numbering.findall(qn('w:num')):
+            number = copy.deepcopy(number)
+            number_ids[number.get(qn('w:numId'))] = str(next_number_id)
+            number.set(qn('w:numId'), str(next_number_id))
+            next_number_id += 1
+            for reference in number.findall(abstract_id):
+                reference.set(WORD_VALUE, abstract_ids.get(reference.get(WORD_VALUE), reference.get(WORD_VALUE)))
+            numbering.append(number)
+        return number_ids
+
+    def merge_notes(self, source):
+        """Copy the footnotes and endnotes of the source under new ids; returns {reference tag: {old id: new id}}."""
+        note_ids = {}
+        for reltype, note_tag, reference_tag, partname in NOTE_TYPES:
+            try:
+                source_notes = source.part.part_related_by(reltype)
+            except KeyError:
+                continue
+            if not isinstance(source_notes, XmlPart):
+                continue
+            if source_notes.rels:
+                logger.warning(f'Relationships of {source_notes.partname} are not carried over')
+            try:
+                notes = self.document.part.part_related_by(reltype)
+            except KeyError:
+                notes = XmlPart(self.document.part.package.next_partname(partname), source_notes.content_type,
+                                copy.deepcopy(source_notes.element), self.document.part.package)
+                self.document.part.relate_to(notes, reltype)
+                continue
+
+            ids = note_ids.setdefault(reference_tag, {})
+            next_id = max_int_attribute(notes.element, note_tag, WORD_ID) + 1
+            for note in source_notes.element.findall(note_tag):
+                if note.get(qn('w:type')) in SEPARATOR_NOTES:
+                    continue
+                note = copy.deepcopy(note)
+                ids[note.get(WORD_ID)] = str(next_id)
+                note.set(WORD_ID, str(next_id))
+                next_id += 1
+                notes.element.append(note)
+        return note_ids
+
+    def merge_styles(self, source, number_ids):
+        """Copy the styles of the source this document lacks; returns {source styleId: new styleId} for renamed ones."""
+        styles = self.document.styles.element
+        existing = {style.get(qn('w:styleId')): style for style in styles.findall(qn('w:style'))}
+        names = {style.find(qn('w:name')).get(WORD_VALUE) for style in existing.values() if style.find(qn('w:name')) is not None}
+
+        # Styles are compared as written, so a list style identical to ours keeps using our list
+        style_ids = {}
+        candidates = source.styles.element.findall(qn('w:style'))
+        for style in candidates:
+            style_id = style.get(qn('w:styleId'))
+            if style_id in existing and existing[style_id].xml != style.xml:
+                new_id = f'{style_id}{self.appended}'
+                while new_id in existing or new_id in style_ids.values():
+                    new_id += 'x'
+                style_ids[style_id] = new_id
+
+        for style in candidates:
+            style = copy.deepcopy(style)
+            for number_id in style.iter(qn('w:numId')):
+                number_id.set(WORD_VALUE, number_ids.get(number_id.get(WORD_VALUE), number_id.get(WORD_VALUE)))
+            style_id = style.get(qn('w:styleId'))
+            if style_id in existing and style_id not in style_ids:
+                continue
+            if style_id in style_ids:
+                style.set(qn('w:styleId'), style_ids[style_id])
+            name = style.find(qn('w:name'))
+            if name is not None:
+                if name.get(WORD_VALUE) in names:
+                    name.set(WORD_VALUE, f'{name.get(WORD_VALUE)} ({self.appended + 1})')
+                names.add(name.get(WORD_VALUE))
+            for reference in style.iter(*STYLE_REFERENCES):
+                if reference.get(WORD_VALUE) in style_ids:
+                    reference.set(WORD_VALUE, style_ids[reference.get(WORD_VALUE)])
+            styles.append(style)
+        return style_ids
+
+
+def merge_docx_files(docx_paths, output_path):
+    """Merge DOCX files, in the given order, into one DOCX at output_path."""
+    merged = Document(docx_paths[0])
+    merger = DocxMerger(merged)
+    for docx_path in docx_paths[1:]:
+        merger.append(Document(docx_path))
+    merged.save(output_path)
+    logger.info(f'Merged {len(docx_paths)} documents into {output_path}')
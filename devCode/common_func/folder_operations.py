@@ -53,7 +53,51 @@ def delete_files_in_folder(folder_path):
     except Exception as e:
         print(f"Error while deleting files in '{folder_path}': {e}")
         return False
-    
+
+
+def unique_destination_path(destination_folder, file_name):
+    """
+    Path for file_name in the destination folder that no file has yet, numbering the name
+    (report.zip, report_1.zip, report_2.zip, ...) when it is taken
+    """
+    base_name, extension = os.path.splitext(file_name)
+    destination_path = os.path.join(destination_folder, file_name)
+    number = 0
+    while os.path.exists(destination_path) or os.path.exists(destination_path + '.partial'):
+        number += 1
+        destination_path = os.path.join(destination_folder, f'{base_name}_{number}{extension}')
+    return destination_path
+
+
+def move_file_atomic(file_path, destination_folder):
+    """
+    Move a file into the destination folder so that it appears there complete or not at all.
+    A file of the same name already there is kept, and the moved file gets a numbered name instead.
+    """
+    os.makedirs(destination_folder, exist_ok=True)
+    destination_path = unique_destination_path(destination_folder, os.path.basename(file_path))
+    if os.path.basename(destination_path) != os.path.basename(file_path):
+        logging.warning(f'{os.path.basename(file_path)} already exists in {destination_folder}, '
+                        f'moving it as {os.path.basename(destination_path)}')
+    try:
+        # A rename within the same volume is atomic
+        os.replace(file_path, destination_path)
+    except OSError:
+        if not os.path.exists(file_path):
+            raise
+        # Different volumes: copy under a temporary name first, then rename into place
+        partial_path = destination_path + '.partial'
+        try:
+            shutil.copy2(file_path, partial_path)
+            os.replace(partial_path, destination_path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        os.remove(file_path)
+    return destination_path
+
+
 def delete_all_files(folders):
     '''Delete all files in the specified folders.'''
     for folder in folders:
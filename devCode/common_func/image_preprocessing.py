@@ -0,0 +1,117 @@
+import numpy as np
+from PIL import Image
+
+# Resolution assumed for images without DPI information, as exported by ABBYY
+ASSUMED_SOURCE_DPI = 300
+
+# Sauvola thresholding: window size in pixels at 300 DPI, sensitivity and dynamic range of the deviation
+SAUVOLA_WINDOW = 31
+SAUVOLA_K = 0.2
+SAUVOLA_R = 128.0
+
+# A row or column belongs to the text band when more than this fraction of its pixels is ink
+INK_LEVEL = 160
+TEXT_BAND_MIN_INK = 0.002
+TEXT_BAND_MARGIN = 12
+
+DEFAULT_OCR_OPTIONS = {
+    'preprocess': False,
+    'target_dpi': 300,
+    'binarize': False,
+    'crop_text_band': False,
+    'engine': 'auto',
+    'logo_dir': '',
+}
+
+
+def to_grayscale(image):
+    """Grayscale copy of the image, with transparent areas (common in logos) turned white instead of black."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGBA', image.size, 'white')
+        background.alpha_composite(image)
+        image = background
+    return image.convert('L')
+
+
+def get_source_dpi(image):
+    dpi = image.info.get('dpi')
+    if dpi and dpi[0] and dpi[0] > 1:
+        return float(dpi[0])
+    return float(ASSUMED_SOURCE_DPI)
+
+
+def downsample(image, source_dpi, target_dpi):
+    """Scale the image down to target_dpi; images at or below it are left as they are."""
+    scale = target_dpi / source_dpi
+    if scale >= 1:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.LANCZOS)
+
+
+def _window_sums(values, window):
+    """Sum of values over a window x window neighbourhood of every pixel, from an integral image."""
+    half = window // 2
+    padded = np.pad(values, ((half + 1, half), (half + 1, half)), mode='edge')
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    return (integral[window:, window:] - integral[:-window, window:]
+            - integral[window:, :-window] + integral[:-window, :-window])
+
+
+def sauvola_binarize(pixels, window=SAUVOLA_WINDOW, k=SAUVOLA_K, r=SAUVOLA_R):
+    """
+    Adaptive threshold of a grayscale array: each pixel is compared to a threshold from the mean and
+    deviation of its neighbourhood, so shaded backgrounds and coloured letterheads binarize cleanly.
+    Returns an array of 0 (ink) and 255 (paper).
+    """
+    pixels = pixels.astype(np.float64)
+    area = float(window * window)
+    mean = _window_sums(pixels, window) / area
+    variance = np.maximum(_window_sums(pixels * pixels, window) / area - mean * mean, 0.0)
+    threshold = mean * (1 + k * (np.sqrt(variance) / r - 1))
+    return np.where(pixels > threshold, 255, 0).astype(np.uint8)
+
+
+def text_band_box(pixels):
+    """Bounding box (left, top, right, bottom) of the rows and columns holding ink, with a margin, or None."""
+    ink = pixels < INK_LEVEL
+    rows = np.flatnonzero(ink.mean(axis=1) > TEXT_BAND_MIN_INK)
+    columns = np.flatnonzero(ink.mean(axis=0) > TEXT_BAND_MIN_INK)
+    if rows.size == 0 or columns.size == 0:
+        return None
+    height, width = pixels.shape
+    return (max(0, columns[0] - TEXT_BAND_MARGIN), max(0, rows[0] - TEXT_BAND_MARGIN),
+            min(width, columns[-1] + 1 + TEXT_BAND_MARGIN), min(height, rows[-1] + 1 + TEXT_BAND_MARGIN))
+
+
+def preprocess_for_ocr(image, target_dpi=300, binarize=False, crop_text_band=False, **_):
+    """
+    Prepare an embedded image for tesseract: grayscale, downsampled to target_dpi, optionally cropped
+    to the band holding text and binarized with an adaptive (Sauvola) threshold.
+    Returns a grayscale image tagged with its resolution.
+    """
+    source_dpi = get_source_dpi(image)
+    image = downsample(to_grayscale(image), source_dpi, target_dpi)
+    dpi = min(source_dpi, target_dpi)
+
+    if crop_text_band:
+        box = text_band_box(np.asarray(image))
+        if box is not None:
+            image = image.crop(box)
+
+    if binarize:
+        # The window follows the resolution, so it spans about the same height of text
+        window = max(15, int(SAUVOLA_WINDOW * dpi / 300) | 1)
+        image = Image.fromarray(sauvola_binarize(np.asarray(image), window))
+
+    image.info['dpi'] = (dpi, dpi)
+    return image
+
+
+def ocr_settings_key(ocr_options):
+    """The preprocessing settings that change the OCR text, as a tuple for cache keys."""
+    if not ocr_options or not ocr_options.get('preprocess'):
+        return ('raw',)
+    return ('preprocess', f"dpi={ocr_options.get('target_dpi')}", f"binarize={bool(ocr_options.get('binarize'))}",
+            f"crop={bool(ocr_options.get('crop_text_band'))}")
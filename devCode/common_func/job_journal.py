@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from logs.logs_handler import get_logger
+
+logger = get_logger(__name__)
+
+# Stages a member file passes through, in pipeline order
+MEMBER_STAGES = ('extracted', 'converted', 'rules_applied', 'formatted', 'written')
+
+# Zip job statuses
+ZIP_STARTED = 'started'
+ZIP_EXTRACTED = 'extracted'
+ZIP_COMPLETED = 'completed'
+
+# One connection per (process, database) so that worker processes never share a handle
+_journals = {}
+
+
+class JobJournal:
+    """
+    Durable record of zip jobs and of every member file through the pipeline stages.
+    Stored in SQLite with WAL journaling so several worker processes can write to it at the same time.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS zip_jobs ('
+            ' zip_key TEXT PRIMARY KEY, zip_name TEXT, status TEXT, updated_at REAL)'
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS member_jobs ('
+            ' zip_key TEXT, member_path TEXT, stage TEXT, updated_at REAL,'
+            ' PRIMARY KEY (zip_key, member_path))'
+        )
+
+    @contextmanager
+    def transaction(self):
+        """Run several statements atomically; the connection is otherwise in autocommit mode."""
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self.connection
+        except Exception:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    def start_zip(self, zip_key, zip_name):
+        """
+        Register a zip job and return its status. An unfinished job keeps its status and members
+        so it can be resumed; a completed or unknown job starts again from scratch.
+        """
+        status = self.get_zip_status(zip_key)
+        if status is not None and status != ZIP_COMPLETED:
+            logger.info(f'Resuming zip job {zip_name} from status: {status}')
+            return status
+
+        with self.transaction():
+            self.connection.execute('DELETE FROM member_jobs WHERE zip_key = ?', (zip_key,))
+            self.connection.execute(
+                'INSERT OR REPLACE INTO zip_jobs (zip_key, zip_name, status, updated_at) VALUES (?, ?, ?, ?)',
+                (zip_key, zip_name, ZIP_STARTED, time.time())
+            )
+        return ZIP_STARTED
+
+    def get_zip_status(self, zip_key):
+        row = self.connection.execute('SELECT status FROM zip_jobs WHERE zip_key = ?', (zip_key,)).fetchone()
+        return row[0] if row else None
+
+    def set_zip_status(self, zip_key, status):
+        self.connection.execute(
+            'UPDATE zip_jobs SET status = ?, updated_at = ? WHERE zip_key = ?',
+            (status, time.time(), zip_key)
+        )
+
+    def record_stage(self, zip_key, member_path, stage):
+        """Record that a member file has completed the given stage."""
+        if stage not in MEMBER_STAGES:
+            raise ValueError(f'Unknown stage: {stage}')
+        self.connection.execute(
+            'INSERT OR REPLACE INTO member_jobs (zip_key, member_path, stage, updated_at) VALUES (?, ?, ?, ?)',
+            (zip_key, member_path, stage, time.time())
+        )
+
+    def register_members(self, zip_key, member_paths):
+        """Mark newly found member files as extracted, leaving members with later stages untouched."""
+        now = time.time()
+        with self.transaction():
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO member_jobs (zip_key, member_path, stage, updated_at) VALUES (?, ?, ?, ?)',
+                [(zip_key, member_path, 'extracted', now) for member_path in member_paths]
+            )
+
+    def get_member_stage(self, zip_key, member_path):
+        row = self.connection.execute(
+            'SELECT stage FROM member_jobs WHERE zip_key = ? AND member_path = ?', (zip_key, member_path)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_written_members(self, zip_key):
+        rows = self.connection.execute(
+            'SELECT member_path FROM member_jobs WHERE zip_key = ? AND stage = ?', (zip_key, 'written')
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def close(self):
+        self.connection.close()
+
+
+def get_zip_key(zip_path):
+    """Identify a zip file by name, size and modification time, so a new drop with the same name is a new job."""
+    stat = os.stat(zip_path)
+    return f'{os.path.basename(zip_path)}:{stat.st_size}:{int(stat.st_mtime)}'
+
+
+def open_journal(db_path):
+    """Return the journal for db_path, opening one connection per process."""
+    key = (os.getpid(), db_path)
+    if key not in _journals:
+        _journals[key] = JobJournal(db_path)
+    return _journals[key]
+
+
+def record_stage(journal_context, member_path, stage):
+    """Record a member stage when journaling is enabled; journal_context is (db_path, zip_key) or None."""
+    if not journal_context:
+        return
+    db_path, zip_key = journal_context
+    try:
+        open_journal(db_path).record_stage(zip_key, member_path, stage)
+    except sqlite3.Error as e:
+        logger.warning(f'Unable to record stage {stage} for {member_path}: {e}')
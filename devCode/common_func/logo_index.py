@@ -0,0 +1,187 @@
+import os
+from functools import lru_cache
+import numpy as np
+from PIL import Image
+from logs.logs_handler import get_logger
+
+logger = get_logger(__name__)
+
+HASH_SIZE = 8
+PHASH_SAMPLE_SIZE = HASH_SIZE * 4
+
+# Most differing bits (out of 64) for two images to count as the same logo, for each hash
+MAX_DHASH_DISTANCE = 10
+MAX_PHASH_DISTANCE = 10
+# A hash match is only a logo when the images have nearly the same shape and no pixel of their grey
+# thumbnails, THUMBNAIL_WIDTH wide, differs by more than MAX_PIXEL_DIFFERENCE grey levels (0-255).
+# Rescaled and re-encoded copies stay around 20; a single changed letter in a banner is over 40
+THUMBNAIL_WIDTH = 96
+MAX_ASPECT_DIFFERENCE = 0.05
+MAX_PIXEL_DIFFERENCE = 32
+DRAFT_SIZE = THUMBNAIL_WIDTH * 2
+MAX_LOGOS = 64
+LOGO_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff')
+
+# Images smaller than this, or thinner than MIN_IMAGE_SIDE, cannot hold readable text
+MIN_IMAGE_PIXELS = 2500
+MIN_IMAGE_SIDE = 16
+# Grey-level entropy (bits) below which an image is a single flat colour; a scanned page with
+# one line of text on white is still around 0.005
+MIN_IMAGE_ENTROPY = 0.001
+
+
+def _dct_matrix(size):
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    return np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+
+
+_DCT = _dct_matrix(PHASH_SAMPLE_SIZE)
+
+
+def grey_image(image):
+    """Grey version of the image for hashing and comparison; a JPEG not loaded yet is decoded at a reduced scale."""
+    image.draft('L', (DRAFT_SIZE, DRAFT_SIZE))
+    return image.convert('L')
+
+
+def _grayscale(image, size):
+    return np.asarray(image.convert('L').resize(size, Image.LANCZOS), dtype=np.float64)
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big')
+
+
+def dhash(image):
+    """Difference hash: whether each pixel is brighter than its left neighbour, on a 9x8 thumbnail."""
+    pixels = _grayscale(image, (HASH_SIZE + 1, HASH_SIZE))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image):
+    """Perceptual hash: low frequencies of the 2-D DCT of a 32x32 thumbnail compared to their median."""
+    pixels = _grayscale(image, (PHASH_SAMPLE_SIZE, PHASH_SAMPLE_SIZE))
+    low_frequencies = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    return _bits_to_int(low_frequencies > np.median(low_frequencies))
+
+
+def hamming_distance(first, second):
+    return (first ^ second).bit_count()
+
+
+def image_entropy(image):
+    """Shannon entropy in bits of the grey-level histogram of the image."""
+    histogram = np.asarray(image.convert('L').histogram(), dtype=np.float64)
+    probabilities = histogram[histogram > 0] / histogram.sum()
+    return float(-(probabilities * np.log2(probabilities)).sum())
+
+
+def is_decorative_image(image):
+    """True for images too small or too uniform to carry header text, such as rules, bullets and spacers."""
+    width, height = image.size
+    if width * height < MIN_IMAGE_PIXELS or min(width, height) < MIN_IMAGE_SIDE:
+        return True
+    return image_entropy(image) < MIN_IMAGE_ENTROPY
+
+
+class LogoIndex:
+    """
+    Curated logos, each mapped to the canonical text of the header it stands for. A candidate is found by
+    dHash and pHash, which still match a logo that was re-encoded, rescaled or slightly recompressed, and
+    then confirmed pixel by pixel on grey thumbnails, so a different banner with close hashes is not
+    taken for the logo. The index holds at most MAX_LOGOS logos and only learns them through add().
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, image):
+        """Return the header text of the known logo the image is a copy of, or None."""
+        image = grey_image(image)
+        image_dhash, image_phash = compute_image_hashes(image)
+        candidates = []
+        for logo_dhash, logo_phash, logo_aspect, logo_thumbnail, text in self.entries:
+            dhash_distance = hamming_distance(image_dhash, logo_dhash)
+            phash_distance = hamming_distance(image_phash, logo_phash)
+            if dhash_distance <= MAX_DHASH_DISTANCE and phash_distance <= MAX_PHASH_DISTANCE:
+                candidates.append((dhash_distance + phash_distance, logo_aspect, logo_thumbnail, text))
+        if not candidates:
+            return None
+
+        aspect = image_aspect(image)
+        for _, logo_aspect, logo_thumbnail, text in sorted(candidates, key=lambda candidate: candidate[0]):
+            if abs(aspect - logo_aspect) > MAX_ASPECT_DIFFERENCE * logo_aspect:
+                continue
+            height, width = logo_thumbnail.shape
+            if np.abs(_grayscale(image, (width, height)) - logo_thumbnail).max() <= MAX_PIXEL_DIFFERENCE:
+                return text
+        return None
+
+    def add(self, image, text):
+        """Add a curated logo with its header text."""
+        if len(self.entries) >= MAX_LOGOS:
+            raise ValueError(f'The logo index holds at most {MAX_LOGOS} logos')
+        image = grey_image(image)
+        image_dhash, image_phash = compute_image_hashes(image)
+        aspect = image_aspect(image)
+        thumbnail = _grayscale(image, (THUMBNAIL_WIDTH, max(1, round(THUMBNAIL_WIDTH / aspect))))
+        self.entries.append((image_dhash, image_phash, aspect, thumbnail, text))
+
+
+def compute_image_hashes(image):
+    image = grey_image(image)
+    return dhash(image), phash(image)
+
+
+def image_aspect(image):
+    width, height = image.size
+    return width / height
+
+
+def logo_files(logo_dir):
+    """(image path, text path) of every logo in logo_dir that has its header text next to it."""
+    pairs = []
+    for name in sorted(os.listdir(logo_dir)):
+        base_name, extension = os.path.splitext(name)
+        text_path = os.path.join(logo_dir, base_name + '.txt')
+        if extension.lower() in LOGO_IMAGE_EXTENSIONS and os.path.isfile(text_path):
+            pairs.append((os.path.join(logo_dir, name), text_path))
+    return pairs
+
+
+def logo_set_signature(logo_dir):
+    """Name and modification time of every curated logo file, which change when the logos are edited."""
+    if not logo_dir or not os.path.isdir(logo_dir):
+        return ()
+    return tuple((os.path.basename(path), os.stat(path).st_mtime_ns) for pair in logo_files(logo_dir) for path in pair)
+
+
+@lru_cache(maxsize=4)
+def _load_logo_index(logo_dir, signature):
+    index = LogoIndex()
+    for image_path, text_path in logo_files(logo_dir):
+        with open(text_path, encoding='utf-8') as text_file:
+            text = text_file.read().strip()
+        with Image.open(image_path) as image:
+            index.add(image, text)
+    logger.info(f'Loaded {len(index)} logos from {logo_dir}')
+    return index
+
+
+def load_logo_index(logo_dir):
+    """
+    The LogoIndex of the curated logos in logo_dir: each image (PNG, JPEG, ...) with a .txt file of the
+    same name holding its header text. Loaded once per process and reloaded when the files change;
+    None when logo_dir is empty or missing, so every image is OCR'd.
+    """
+    if not logo_dir or not os.path.isdir(logo_dir):
+        return None
+    try:
+        return _load_logo_index(os.path.abspath(logo_dir), logo_set_signature(logo_dir))
+    except (OSError, ValueError) as e:
+        logger.warning(f'Logo index unavailable at {logo_dir}: {e}')
+        return None
@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import hashlib
+import time
+from logs.logs_handler import get_logger
+
+logger = get_logger(__name__)
+
+# One cache handle per (process, database path)
+_caches = {}
+
+# Part of every key; raised when texts cached by earlier versions must not be used. Version 2 drops the
+# header texts that logos matched by hash alone stored under the keys of other images
+CACHE_KEY_VERSION = 2
+
+
+class OcrCache:
+    """
+    OCR texts keyed by the hash of the image bytes and the OCR settings, with size-bounded LRU eviction.
+    The texts are kept in a SQLite database (WAL mode) shared by all worker processes, which also keeps
+    hit/miss counters. A handle must only be used from the thread that opened it.
+    """
+
+    def __init__(self, db_path, max_bytes):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, text TEXT, size INTEGER, last_access REAL)'
+        )
+        self.connection.execute('CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)')
+        # Logos learned from OCR text by earlier versions; the LogoIndex now only uses curated logos
+        self.connection.execute('DROP TABLE IF EXISTS logos')
+
+    def get(self, key):
+        """Return the cached text for key, or None on a cache miss."""
+        row = self.connection.execute('SELECT text FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.increment('misses')
+            return None
+
+        self.connection.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+        self.increment('hits')
+        return row[0]
+
+    def put(self, key, text):
+        """Store the text under key, then evict least recently used entries over the size limit."""
+        self.connection.execute(
+            'INSERT OR REPLACE INTO entries (key, text, size, last_access) VALUES (?, ?, ?, ?)',
+            (key, text, len(text.encode('utf-8')), time.time())
+        )
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        total_size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+
+        for key, size in self.connection.execute('SELECT key, size FROM entries ORDER BY last_access').fetchall():
+            if total_size <= self.max_bytes:
+                break
+            self.connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total_size -= size
+            logger.info(f'Evicted cached OCR text {key}')
+
+    def increment(self, name):
+        self.connection.execute(
+            'INSERT INTO stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1',
+            (name,)
+        )
+
+    def stats(self):
+        """Return hit and miss counters and the hit rate across all processes using this cache."""
+        counters = dict(self.connection.execute('SELECT name, value FROM stats').fetchall())
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0,
+            'logo_hits': counters.get('logo_hits', 0),
+            'skipped_images': counters.get('skipped_images', 0),
+        }
+
+
+def compute_image_key(img_blob, settings=()):
+    """SHA-256 of the image bytes and of the OCR settings (engine version, language, options) that produce the text."""
+    digest = hashlib.sha256(img_blob)
+    digest.update(f'\0v{CACHE_KEY_VERSION}'.encode('utf-8'))
+    for setting in settings:
+        digest.update(b'\0' + str(setting).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def open_ocr_cache(cache_context):
+    """Return the cache for cache_context, which is (db_path, max_bytes) or None when caching is disabled."""
+    if not cache_context:
+        return None
+    db_path, max_bytes = cache_context
+    key = (os.getpid(), db_path)
+    if key not in _caches:
+        try:
+            _caches[key] = OcrCache(db_path, max_bytes)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f'OCR cache unavailable at {db_path}: {e}')
+            return None
+    return _caches[key]
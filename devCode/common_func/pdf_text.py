@@ -0,0 +1,106 @@
+import ctypes
+from collections import namedtuple
+import pdfplumber
+from pdfplumber.utils import crop_to_bbox
+from pdfplumber.utils.text import WordExtractor
+from logs.logs_handler import get_logger
+
+logger = get_logger(__name__)
+
+TEXT_BACKEND_PDFPLUMBER = 'pdfplumber'
+TEXT_BACKEND_PDFIUM = 'pypdfium2'
+TEXT_BACKEND_AUTO = 'auto'
+
+PageChars = namedtuple('PageChars', ['chars', 'width', 'height'])
+TextViews = namedtuple('TextViews', ['layout', 'plain'])
+
+
+def read_pdfplumber_chars(pdf_path, page_number):
+    with pdfplumber.open(pdf_path) as pdf:
+        page = pdf.pages[page_number]
+        return PageChars(tuple(page.chars), page.width, page.height)
+
+
+def _pdfium_font_name(raw, textpage, index, buffer):
+    length = raw.FPDFText_GetFontInfo(textpage, index, buffer, len(buffer), None)
+    return buffer.value.decode('utf-8', 'replace') if 0 < length <= len(buffer) else ''
+
+
+def read_pdfium_chars(pdf_path, page_number):
+    """Characters of a page from pdfium's text page, with the keys pdfplumber's word extraction uses."""
+    import pypdfium2 as pdfium
+    import pypdfium2.raw as pdfium_raw
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        page = pdf[page_number]
+        width, height = page.get_size()
+        textpage = page.get_textpage()
+        font_buffer = ctypes.create_string_buffer(256)
+        chars = []
+        for index in range(textpage.count_chars()):
+            # Spaces and line breaks pdfium infers from the layout are not on the page
+            if pdfium_raw.FPDFText_IsGenerated(textpage.raw, index) == 1:
+                continue
+            text = textpage.get_text_range(index, 1)
+            if not text or text in '\r\n':
+                continue
+            left, bottom, right, top = textpage.get_charbox(index, loose=True)
+            chars.append({
+                'text': text,
+                'fontname': _pdfium_font_name(pdfium_raw, textpage.raw, index, font_buffer),
+                'size': pdfium_raw.FPDFText_GetFontSize(textpage.raw, index),
+                'x0': left,
+                'x1': right,
+                'top': height - top,
+                'bottom': height - bottom,
+                'doctop': height - top,
+                'width': right - left,
+                'height': top - bottom,
+                'upright': abs(pdfium_raw.FPDFText_GetCharAngle(textpage.raw, index)) < 0.01,
+            })
+        textpage.close()
+        page.close()
+        return PageChars(tuple(chars), width, height)
+    finally:
+        pdf.close()
+
+
+def resolve_text_backend(backend):
+    if backend == TEXT_BACKEND_AUTO:
+        try:
+            import pypdfium2  # noqa: F401
+            return TEXT_BACKEND_PDFIUM
+        except ImportError:
+            return TEXT_BACKEND_PDFPLUMBER
+    if backend not in (TEXT_BACKEND_PDFPLUMBER, TEXT_BACKEND_PDFIUM):
+        raise ValueError(f'Unknown PDF text backend: {backend}')
+    return backend
+
+
+def read_page_chars(pdf_path, page_number=0, backend=TEXT_BACKEND_PDFPLUMBER):
+    """Characters of one page of a PDF and its size, read with the text backend."""
+    backend = resolve_text_backend(backend)
+    logger.info(f'Reading the text of page {page_number + 1} of {pdf_path} with {backend}')
+    if backend == TEXT_BACKEND_PDFIUM:
+        return read_pdfium_chars(pdf_path, page_number)
+    return read_pdfplumber_chars(pdf_path, page_number)
+
+
+def text_views(chars, bbox):
+    """
+    Layout and plain text of the characters within bbox (x0, top, x1, bottom), as
+    extract_text(layout=True) and extract_text() of the page cropped to bbox return them,
+    from a single word extraction.
+    """
+    x0, top, x1, bottom = bbox
+    wordmap = WordExtractor().extract_wordmap(crop_to_bbox(chars, bbox))
+    textmap_kwargs = {'layout_bbox': bbox, 'layout_width': x1 - x0, 'layout_height': bottom - top, 'presorted': True}
+    return TextViews(wordmap.to_textmap(layout=True, **textmap_kwargs).as_string,
+                     wordmap.to_textmap(**textmap_kwargs).as_string)
+
+
+def get_page_text(pdf_path, page_number=0, bbox=None, backend=TEXT_BACKEND_PDFPLUMBER):
+    """Layout and plain text of a page of a PDF, or of the part of it within bbox."""
+    page = read_page_chars(pdf_path, page_number, backend)
+    return text_views(page.chars, bbox or (0, 0, page.width, page.height))
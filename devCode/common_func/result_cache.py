@@ -0,0 +1,142 @@
+import os
+import shutil
+import sqlite3
+import hashlib
+import time
+from logs.logs_handler import get_logger
+
+logger = get_logger(__name__)
+
+# Bump whenever a converter or rule change should invalidate previously cached outputs
+PIPELINE_VERSION = '1'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# One cache handle per (process, cache folder)
+_caches = {}
+
+
+class ResultCache:
+    """
+    Content-addressed store of final output documents with size-bounded LRU eviction.
+    Output files live under cache_dir/objects and are indexed in a SQLite database (WAL mode),
+    which also keeps hit/miss counters shared by all worker processes.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, 'objects'), exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(cache_dir, 'index.db'), timeout=30, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER, last_access REAL)'
+        )
+        self.connection.execute('CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER)')
+
+    def get_object_path(self, key):
+        return os.path.join(self.cache_dir, 'objects', key[:2], key)
+
+    def get(self, key, destination_path):
+        """Copy the cached output for key to destination_path. Returns True on a cache hit."""
+        row = self.connection.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.increment('misses')
+            return False
+
+        object_path = self.get_object_path(key)
+        try:
+            shutil.copyfile(object_path, destination_path)
+        except OSError as e:
+            # Another worker process may have evicted the object since the lookup
+            logger.warning(f'Cached output {key} unavailable, dropping its entry: {e}')
+            self.connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            if os.path.exists(destination_path):
+                os.remove(destination_path)
+            self.increment('misses')
+            return False
+
+        self.connection.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), key))
+        self.increment('hits')
+        return True
+
+    def put(self, key, source_path):
+        """Store a copy of source_path under key, then evict least recently used entries over the size limit."""
+        object_path = self.get_object_path(key)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+        # Copy under a process specific name and rename, so readers never see a partial file
+        partial_path = f'{object_path}.{os.getpid()}.partial'
+        shutil.copyfile(source_path, partial_path)
+        os.replace(partial_path, object_path)
+
+        self.connection.execute(
+            'INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)',
+            (key, os.path.getsize(object_path), time.time())
+        )
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        total_size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+
+        for key, size in self.connection.execute('SELECT key, size FROM entries ORDER BY last_access').fetchall():
+            if total_size <= self.max_bytes:
+                break
+            self.connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            try:
+                os.remove(self.get_object_path(key))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            logger.info(f'Evicted cached result {key}')
+
+    def increment(self, name):
+        self.connection.execute(
+            'INSERT INTO stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1',
+            (name,)
+        )
+
+    def stats(self):
+        """Return hit and miss counters and the hit rate across all processes using this cache."""
+        counters = dict(self.connection.execute('SELECT name, value FROM stats').fetchall())
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / lookups if lookups else 0.0}
+
+
+def compute_cache_key(file_path, jurisdiction, version=PIPELINE_VERSION, settings=()):
+    """
+    SHA-256 of the input file contents, the jurisdiction and the pipeline version.
+    The lower-cased file name is included too, because the CO rules choose their behaviour from it,
+    and so are any settings that change the output (such as the formatting mode).
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    digest.update(b'\0' + (jurisdiction or '').lower().encode('utf-8'))
+    digest.update(b'\0' + os.path.basename(file_path).lower().encode('utf-8'))
+    digest.update(b'\0' + version.encode('utf-8'))
+    for setting in settings:
+        digest.update(b'\0' + str(setting).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def open_result_cache(cache_context):
+    """Return the cache for cache_context, which is (cache_dir, max_bytes) or None when caching is disabled."""
+    if not cache_context:
+        return None
+    cache_dir, max_bytes = cache_context
+    key = (os.getpid(), cache_dir)
+    if key not in _caches:
+        try:
+            _caches[key] = ResultCache(cache_dir, max_bytes)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f'Result cache unavailable at {cache_dir}: {e}')
+            return None
+    return _caches[key]
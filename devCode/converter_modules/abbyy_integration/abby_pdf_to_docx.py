@@ -1,105 +1,341 @@
-import win32com.client as win32c
+import os
+import abc
+import time
+import queue
+import atexit
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from converter_modules.abbyy_integration import SamplesConfig
+from common_func.com_worker import ComWorker
+from common_func.docx_merge import merge_docx_files
 from logs.logs_handler import get_logger
 
 logger = get_logger(__name__)
 
-def Run(file_path,output_path):
-    ## Load ABBYY FineReader Engine
-    LoadEngine()
+DEFAULT_PROFILE = "DocumentConversion_Accuracy"
+## Possible profile names are:
+## "DocumentConversion_Accuracy", "DocumentConversion_Speed",
+## "DocumentArchiving_Accuracy", "DocumentArchiving_Speed",
+## "BookArchiving_Accuracy", "BookArchiving_Speed",
+## "TextExtraction_Accuracy", "TextExtraction_Speed",
+## "FieldLevelRecognition",
+## "BarcodeRecognition_Accuracy", "BarcodeRecognition_Speed",
+## "HighCompressedImageOnlyPdf",
+## "BusinessCardsProcessing",
+## "EngineeringDrawingsProcessing",
+## "Version9Compatibility",
+## "Default"
+
+## Engines kept loaded in each process; one conversion runs per engine at a time
+ENGINE_POOL_SIZE = 1
+## Engines are reloaded after this many documents, and after any failed conversion
+MAX_DOCUMENTS_PER_ENGINE = 200
+
+## PDFs with more pages than the threshold are split into chunks of CHUNK_PAGES pages, converted
+## side by side on the engines of the pool and merged back in page order (0 turns chunking off)
+CHUNK_THRESHOLD = 100
+CHUNK_PAGES = 25
+
+_engine_pool = None
+_engine_pool_settings = {'backend': None, 'size': ENGINE_POOL_SIZE}
+_engine_pool_lock = threading.Lock()
+
+
+class EngineBackend(abc.ABC):
+    """Interface for the engine used to convert PDF files to DOCX."""
+
+    @abc.abstractmethod
+    def load_engine(self):
+        """Start an engine ready for conversions and return its handle."""
+
+    @abc.abstractmethod
+    def convert(self, engine, file_path, output_path):
+        """Convert file_path to a DOCX at output_path with a loaded engine."""
+
+    @abc.abstractmethod
+    def unload_engine(self, engine):
+        """Shut down an engine returned by load_engine."""
+
+
+class FREngineBackend(EngineBackend):
+    """ABBYY FineReader Engine 12 through the out-of-process COM loader."""
+
+    def __init__(self, profile=DEFAULT_PROFILE):
+        self.profile = profile
+
+    def load_engine(self):
+        import win32com.client as win32c
+
+        DisplayMessage("Initializing Engine...")
+        engine_loader = win32c.Dispatch("FREngine.OutprocLoader.12")
+        engine = engine_loader.InitializeEngine( SamplesConfig.GetCustomerProjectId(), SamplesConfig.GetLicensePath(), SamplesConfig.GetLicensePassword(), "", "", False )
+        logger.info('Engine initialized')
+
+        DisplayMessage( "Loading predefined profile..." )
+        engine.LoadPredefinedProfile( self.profile )
+        return engine_loader, engine
+
+    def convert(self, engine, file_path, output_path):
+        engine_loader, fr_engine = engine
+        ProcessImage(fr_engine, file_path, output_path)
+
+    def unload_engine(self, engine):
+        engine_loader, fr_engine = engine
+        DisplayMessage( "Deinitializing Engine..." )
+        engine_loader.ExplicitlyUnload()
+
+
+class StubEngineBackend(EngineBackend):
+    """Stand-in engine with configurable start-up and conversion latency, for benchmarking without ABBYY."""
+
+    def __init__(self, load_latency=2.0, convert_latency=0.5):
+        self.load_latency = load_latency
+        self.convert_latency = convert_latency
+
+    def load_engine(self):
+        time.sleep(self.load_latency)
+        return object()
+
+    def convert(self, engine, file_path, output_path):
+        time.sleep(self.convert_latency)
+        with open(output_path, 'wb'):
+            pass
+
+    def unload_engine(self, engine):
+        pass
+
+
+class EnginePool:
+    """
+    Pool of pre-initialised engines with their profile loaded. Each engine lives on its own
+    COM worker thread; a conversion borrows an idle engine and returns it when done. An engine
+    whose conversion failed, or that has converted max_documents documents, is unloaded and a
+    new one loaded in its place; when that load fails too, it is retried on the next checkout.
+    """
+
+    def __init__(self, backend, size=ENGINE_POOL_SIZE, max_documents=MAX_DOCUMENTS_PER_ENGINE):
+        self.backend = backend
+        self.size = size
+        self.max_documents = max_documents
+        self._workers = []
+        self._idle = queue.Queue()
+        try:
+            for number in range(size):
+                worker = ComWorker(f'abbyy-engine-{number}')
+                self._workers.append(worker)
+                engine = worker.call(backend.load_engine)
+                self._idle.put((worker, engine, 0))
+        except BaseException:
+            # Unload the engines that did load and stop every worker thread started so far
+            while not self._idle.empty():
+                worker, engine, _ = self._idle.get_nowait()
+                try:
+                    worker.call(backend.unload_engine, engine)
+                except Exception as e:
+                    DisplayMessage(e, excp_flag=True)
+            for worker in self._workers:
+                worker.stop()
+            raise
+        logger.info(f'Engine pool ready with {size} engines')
+
+    def convert(self, file_path, output_path):
+        """Convert one file on the next idle engine, waiting for one to become free."""
+        worker, engine, documents = self._idle.get()
+        try:
+            if engine is None:
+                engine = worker.call(self.backend.load_engine)
+                documents = 0
+            result = worker.call(self.backend.convert, engine, file_path, output_path)
+        except BaseException:
+            self._idle.put((worker, self.reload_engine(worker, engine, 'after a failed conversion'), 0))
+            raise
+
+        documents += 1
+        if documents >= self.max_documents:
+            engine, documents = self.reload_engine(worker, engine, f'after {documents} documents'), 0
+        self._idle.put((worker, engine, documents))
+        return result
+
+    def reload_engine(self, worker, engine, reason):
+        """Unload engine and load a new one on its worker; returns None when the new engine fails to load."""
+        DisplayMessage( f"Reloading engine {worker.name} {reason}" )
+        if engine is not None:
+            try:
+                worker.call(self.backend.unload_engine, engine)
+            except Exception as e:
+                DisplayMessage(e, excp_flag=True)
+        try:
+            return worker.call(self.backend.load_engine)
+        except Exception as e:
+            DisplayMessage( f"Unable to load a new engine, retrying on next use: {e}", excp_flag=True )
+            return None
+
+    def close(self):
+        """Unload every engine once it is idle and stop the worker threads."""
+        for _ in range(len(self._workers)):
+            worker, engine, _ = self._idle.get()
+            if engine is not None:
+                try:
+                    worker.call(self.backend.unload_engine, engine)
+                except Exception as e:
+                    DisplayMessage(e, excp_flag=True)
+            worker.stop()
+        self._workers = []
+
+
+def configure_engine_pool(backend=None, size=None):
+    """Choose the backend and size used for this process's engine pool, replacing a running pool."""
+    global _engine_pool
+    with _engine_pool_lock:
+        settings = dict(_engine_pool_settings)
+        if backend is not None:
+            settings['backend'] = backend
+        if size is not None:
+            settings['size'] = size
+        if settings == _engine_pool_settings:
+            return
+        _engine_pool_settings.update(settings)
+        if _engine_pool is not None:
+            _engine_pool.close()
+            _engine_pool = None
+
+
+def get_engine_pool():
+    """Return this process's engine pool, loading the engines on first use."""
+    global _engine_pool
+    with _engine_pool_lock:
+        if _engine_pool is None:
+            backend = _engine_pool_settings['backend'] or FREngineBackend()
+            _engine_pool = EnginePool(backend, _engine_pool_settings['size'])
+        return _engine_pool
+
+
+def shutdown_engine_pool():
+    global _engine_pool
+    with _engine_pool_lock:
+        if _engine_pool is not None:
+            _engine_pool.close()
+            _engine_pool = None
+
+
+atexit.register(shutdown_engine_pool)
+
+
+def Run(file_path,output_path,chunk_threshold=CHUNK_THRESHOLD,chunk_pages=CHUNK_PAGES):
+    ## Borrow a loaded ABBYY FineReader Engine from the pool of this process
+    engine_pool = get_engine_pool()
+
+    ## Large PDFs are converted in page chunks when the pool has engines to run them side by side
+    if chunk_threshold and engine_pool.size > 1:
+        try:
+            page_count = CountPages(file_path)
+            if page_count > chunk_threshold:
+                ProcessInChunks(engine_pool, file_path, output_path, page_count, chunk_pages)
+                return
+        except Exception as e:
+            DisplayMessage( f"Chunked conversion failed, converting the whole file: {e}", excp_flag=True )
+
     try:
         ## Process with ABBYY FineReader Engine
-        ProcessWithEngine(file_path,output_path)
+        engine_pool.convert(file_path,output_path)
+    except Exception as e:
+        DisplayMessage( e, excp_flag=True )
+        raise
+
+def CountPages(file_path):
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        return len(pdf)
     finally:
-	## Unload ABBYY FineReader Engine
-        UnloadEngine()
-
-def LoadEngine():
-    global Engine
-    global EngineLoader
-    
-    DisplayMessage("Initializing Engine...")
-    EngineLoader = win32c.Dispatch("FREngine.OutprocLoader.12")
-    
-    Engine = EngineLoader.InitializeEngine( SamplesConfig.GetCustomerProjectId(), SamplesConfig.GetLicensePath(), SamplesConfig.GetLicensePassword(), "", "", False )
-    logger.info('Engine initialized')
-    
-def ProcessWithEngine(file_path,output_path):
+        pdf.close()
+
+def SplitPdf(file_path, chunk_dir, page_ranges):
+    """Write each (first page, end page) range of the PDF to its own PDF in chunk_dir and return their paths."""
+    import pypdfium2 as pdfium
+
+    chunk_paths = []
+    source = pdfium.PdfDocument(file_path)
     try:
-        ## Setup FREngine
-        SetupFREngine()
-        ## Process sample image
-        ProcessImage(file_path,output_path)
-    except Exception as e:
-        DisplayMessage( e )
-
-def SetupFREngine():
-    global Engine
-    
-    DisplayMessage( "Loading predefined profile..." )
-    Engine.LoadPredefinedProfile( "DocumentConversion_Accuracy" )
-    ## Possible profile names are:
-    ## "DocumentConversion_Accuracy", "DocumentConversion_Speed",
-    ## "DocumentArchiving_Accuracy", "DocumentArchiving_Speed",
-    ## "BookArchiving_Accuracy", "BookArchiving_Speed",
-    ## "TextExtraction_Accuracy", "TextExtraction_Speed",
-    ## "FieldLevelRecognition",
-    ## "BarcodeRecognition_Accuracy", "BarcodeRecognition_Speed",
-    ## "HighCompressedImageOnlyPdf",
-    ## "BusinessCardsProcessing",
-    ## "EngineeringDrawingsProcessing",
-    ## "Version9Compatibility",
-    ## "Default"
-
-def ProcessImage(file_path,output_path):
-    global Engine
-
-    imagePath = file_path 
+        for number, (first_page, end_page) in enumerate(page_ranges):
+            chunk = pdfium.PdfDocument.new()
+            try:
+                chunk.import_pages(source, list(range(first_page, end_page)))
+                chunk_path = os.path.join(chunk_dir, f"chunk_{number:04d}.pdf")
+                chunk.save(chunk_path)
+            finally:
+                chunk.close()
+            chunk_paths.append(chunk_path)
+    finally:
+        source.close()
+    return chunk_paths
+
+def ProcessInChunks(engine_pool, file_path, output_path, page_count, chunk_pages):
+    """Convert the PDF in page chunks on all engines of the pool and merge the DOCX outputs in page order."""
+    ## At most chunk_pages pages a chunk, with the number of chunks a multiple of the engines so they finish together
+    chunk_count = -(-page_count // chunk_pages)
+    chunk_count = -(-chunk_count // engine_pool.size) * engine_pool.size
+    chunk_pages = -(-page_count // chunk_count)
+    page_ranges = [(first_page, min(first_page + chunk_pages, page_count)) for first_page in range(0, page_count, chunk_pages)]
+    DisplayMessage( f"Converting {page_count} pages in {len(page_ranges)} chunks on {engine_pool.size} engines..." )
+    chunk_dir = tempfile.mkdtemp(prefix="chunks_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        chunk_paths = SplitPdf(file_path, chunk_dir, page_ranges)
+        docx_paths = [os.path.splitext(chunk_path)[0] + ".docx" for chunk_path in chunk_paths]
+        with ThreadPoolExecutor(max_workers=engine_pool.size) as executor:
+            list(executor.map(engine_pool.convert, chunk_paths, docx_paths))
+
+        ## Check every chunk came out before merging
+        missing = [docx_path for docx_path in docx_paths if not os.path.exists(docx_path)]
+        if missing:
+            raise RuntimeError(f"{len(missing)} of {len(docx_paths)} chunks were not converted")
+        merge_docx_files(docx_paths, output_path)
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+
+def ProcessImage(engine,file_path,output_path):
+    imagePath = file_path
 
     ## Create document
-    document = Engine.CreateFRDocument()
+    document = engine.CreateFRDocument()
 
     try:
-	## Add image file to document
+        ## Add image file to document
         DisplayMessage( "Loading image..." )
         document.AddImageFile( imagePath, None, None )
 
-	## Process document
+        ## Process document
         DisplayMessage( "Process..." )
         document.Process( None )
 
-	## Save results
+        ## Save results
         DisplayMessage( "Saving results..." )
         FEF_RTF = 0
         FEF_PDF = 4
         FEF_DOCX = 8
         PES_Balanced = 1
-        
-        export_params = Engine.CreateRTFExportParams()
+
+        export_params = engine.CreateRTFExportParams()
         export_params.PictureExportParams.Resolution = 300
         export_params.BackgroundColorMode = 1
         export_params.PageSynthesisMode = 2
         export_params.KeepPageBreaks= 1
         export_params.UseDocumentStructure = True
 
-	## Save results to rtf with default parameters
-        rtfExportPath = output_path 
+        ## Save results to rtf with default parameters
+        rtfExportPath = output_path
         document.Export( rtfExportPath,FEF_DOCX , export_params )
-    
+
     except Exception as e:
-        DisplayMessage( e )
+        DisplayMessage( e, excp_flag=True )
+        raise
     finally:
         ## Close document
         document.Close()
 
-def UnloadEngine():
-    global Engine
-    global EngineLoader
-    DisplayMessage( "Deinitializing Engine..." )
-    Engine = None
-    EngineLoader.ExplicitlyUnload()
-    EngineLoader = None
-
 def DisplayMessage( message ,excp_flag = False):
     if excp_flag:
         logger.error(message)
@@ -107,13 +343,7 @@ def DisplayMessage( message ,excp_flag = False):
         logger.info(message)
 
 # try:
-#     ## Include config-file SamplesConfig.py
-#     # with open('..\\SamplesConfig.py') as f:
-#     #     code = compile(f.read(), '..\\SamplesConfig.py', 'exec')
-#     #     exec(code)
-#     EngineLoader = None
-#     Engine = None
-
+#     configure_engine_pool(size=1)
 #     Run(r"C:\File\NETSCAN\Input\co_a009a116BasisAndPurpose.pdf",r"C:\File\NETSCAN\Input\co_a009a116BasisAndPurpose_pg_frame.docx")
 # except Exception as e:
 #     DisplayMessage( e )
@@ -1,22 +1,272 @@
-import comtypes.client
+import os
+import abc
+import time
+import uuid
+import queue
+import atexit
+import shutil
+import signal
 import logging
+import threading
+from concurrent.futures import TimeoutError
+from common_func.com_worker import ComWorker
 
+WORD_FORMAT_DOCX = 16                       # FileFormat=16 is for .docx
 
-def convert_file_to_docx(file_path, output_path):
-    """ 
-    Convert a PDF or DOC file to DOCX format using Microsoft Word. 
+WORD_POOL_SIZE = 1                          # warm Word sessions kept per process
+MAX_DOCUMENTS_PER_SESSION = 50              # recycle a session after this many documents
+SESSION_TIMEOUT = 300                       # seconds before a Word call is treated as hung
+CHECKOUT_TIMEOUT = 900                      # seconds to wait for an idle session before giving up
+
+_word_pool = None
+_word_pool_settings = {
+    'backend': None,
+    'size': WORD_POOL_SIZE,
+    'max_documents': MAX_DOCUMENTS_PER_SESSION,
+    'timeout': SESSION_TIMEOUT,
+}
+_word_pool_lock = threading.Lock()
+
+
+class WordBackend(abc.ABC):
+    """Interface to the application used to open, convert and edit Word documents."""
+
+    @abc.abstractmethod
+    def start(self):
+        """Start an application instance and return (app, process_id); process_id may be None."""
+
+    @abc.abstractmethod
+    def convert(self, app, file_path, output_path):
+        """Save file_path as DOCX at output_path."""
+
+    @abc.abstractmethod
+    def quit(self, app):
+        """Close the application instance."""
+
+    def kill(self, process_id):
+        """Forcefully end an instance that no longer responds."""
+        if process_id:
+            os.kill(process_id, signal.SIGTERM)
+
+
+class ComWordBackend(WordBackend):
+    """Microsoft Word through COM automation."""
+
+    def start(self):
+        import comtypes.client
+
+        word = comtypes.client.CreateObject('Word.Application')
+        word.Visible = False                                      # Keep Word application hidden
+        return word, self.find_process_id(word)
+
+    def find_process_id(self, word):
+        """Find the WINWORD.EXE process behind this instance through a unique window caption."""
+        try:
+            import win32gui
+            import win32process
+
+            caption = f'netscan-{uuid.uuid4()}'
+            word.Caption = caption
+            hwnd = win32gui.FindWindow('OpusApp', caption)
+            return win32process.GetWindowThreadProcessId(hwnd)[1] if hwnd else None
+        except Exception as e:
+            logging.warning(f"Unable to find Word process id: {e}")
+            return None
+
+    def convert(self, app, file_path, output_path):
+        doc = app.Documents.Open(file_path)
+        try:
+            doc.SaveAs(output_path, FileFormat=WORD_FORMAT_DOCX)
+        finally:
+            doc.Close()
+
+    def quit(self, app):
+        app.Quit()
+
+
+class FakeWordBackend(WordBackend):
+    """Stand-in for Word that copies the input file, with configurable start-up and conversion latency."""
+
+    def __init__(self, start_latency=0.0, convert_latency=0.0):
+        self.start_latency = start_latency
+        self.convert_latency = convert_latency
+        self.started = 0
+        self.converted = 0
+
+    def start(self):
+        time.sleep(self.start_latency)
+        self.started += 1
+        return object(), None
+
+    def convert(self, app, file_path, output_path):
+        time.sleep(self.convert_latency)
+        shutil.copyfile(file_path, output_path)
+        self.converted += 1
+
+    def quit(self, app):
+        pass
+
+
+class WordSession:
+    """One running Word instance, owned by its own COM worker thread."""
+
+    def __init__(self, backend, name):
+        self.backend = backend
+        self.worker = ComWorker(name)
+        try:
+            self.app, self.process_id = self.worker.call(backend.start)
+        except BaseException:
+            self.worker.stop()
+            raise
+        self.documents = 0
+
+    def run(self, func, *args, timeout=None):
+        """Run func(app, *args) on the session thread."""
+        return self.worker.call(func, self.app, *args, timeout=timeout)
+
+    def close(self, timeout=None):
+        try:
+            self.worker.call(self.backend.quit, self.app, timeout=timeout)
+        except Exception as e:
+            logging.warning(f"Word session did not quit cleanly: {e}")
+            self.kill()
+        self.worker.stop()
+
+    def kill(self):
+        try:
+            self.backend.kill(self.process_id)
+        except Exception as e:
+            logging.error(f"Unable to end Word process {self.process_id}: {e}")
+        self.worker.stop()
+
+
+class WordSessionPool:
     """
-    word = comtypes.client.CreateObject('Word.Application')
-    word.Visible = False                                          # Keep Word application hidden
+    Pool of warm Word sessions. Each call borrows an idle session; a session is recycled after
+    max_documents documents, and killed and replaced when a call runs longer than timeout seconds.
+    A replacement that fails to start leaves an empty slot, started again on its next checkout,
+    so the pool never shrinks.
+    """
+
+    def __init__(self, backend, size=WORD_POOL_SIZE, max_documents=MAX_DOCUMENTS_PER_SESSION, timeout=SESSION_TIMEOUT,
+                 checkout_timeout=CHECKOUT_TIMEOUT):
+        self.backend = backend
+        self.size = size
+        self.max_documents = max_documents
+        self.timeout = timeout
+        self.checkout_timeout = checkout_timeout
+        self._created = 0
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self.new_session())
+
+    def new_session(self):
+        self._created += 1
+        return WordSession(self.backend, f'word-session-{self._created}')
+
+    def replace_session(self):
+        """Start a new session, or return None to start it on the next checkout."""
+        try:
+            return self.new_session()
+        except Exception as e:
+            logging.error(f"Unable to start a new Word session, retrying on next use: {e}")
+            return None
+
+    def checkout(self):
+        try:
+            session = self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            raise RuntimeError(f"No Word session became free within {self.checkout_timeout}s") from None
+        if session is None:
+            try:
+                session = self.new_session()
+            except BaseException:
+                self._idle.put(None)
+                raise
+        return session
+
+    def run(self, func, *args):
+        """Run func(app, *args) on an idle session and return its result."""
+        session = self.checkout()
+        try:
+            result = session.run(func, *args, timeout=self.timeout)
+        except TimeoutError:
+            logging.error(f"Word session hung for more than {self.timeout}s, replacing it")
+            session.kill()
+            self._idle.put(self.replace_session())
+            raise
+        except BaseException:
+            self._idle.put(session)
+            raise
+
+        session.documents += 1
+        if session.documents >= self.max_documents:
+            logging.info(f"Recycling Word session after {session.documents} documents")
+            session.close(timeout=self.timeout)
+            session = self.replace_session()
+        self._idle.put(session)
+        return result
+
+    def convert(self, file_path, output_path):
+        return self.run(self.backend.convert, file_path, output_path)
+
+    def close(self):
+        for _ in range(self.size):
+            session = self._idle.get(timeout=self.checkout_timeout)
+            if session is not None:
+                session.close(timeout=self.timeout)
 
+
+def configure_word_pool(backend=None, size=None, max_documents=None, timeout=None):
+    """Choose the backend and limits used for this process's Word pool, replacing a running pool when they change."""
+    global _word_pool
+    with _word_pool_lock:
+        settings = dict(_word_pool_settings)
+        for name, value in (('backend', backend), ('size', size), ('max_documents', max_documents), ('timeout', timeout)):
+            if value is not None:
+                settings[name] = value
+        if settings == _word_pool_settings:
+            return
+        _word_pool_settings.update(settings)
+        if _word_pool is not None:
+            _word_pool.close()
+            _word_pool = None
+
+
+def get_word_pool():
+    """Return this process's Word session pool, starting the sessions on first use."""
+    global _word_pool
+    with _word_pool_lock:
+        if _word_pool is None:
+            _word_pool = WordSessionPool(
+                _word_pool_settings['backend'] or ComWordBackend(),
+                _word_pool_settings['size'],
+                _word_pool_settings['max_documents'],
+                _word_pool_settings['timeout']
+            )
+        return _word_pool
+
+
+def shutdown_word_pool():
+    global _word_pool
+    with _word_pool_lock:
+        if _word_pool is not None:
+            _word_pool.close()
+            _word_pool = None
+
+
+atexit.register(shutdown_word_pool)
+
+
+def convert_file_to_docx(file_path, output_path):
+    """
+    Convert a PDF or DOC file to DOCX format using a warm Microsoft Word session.
+    """
     try:
         logging.info(f"Converting {file_path} to {output_path}")
-        doc = word.Documents.Open(file_path)
-        doc.SaveAs(output_path, FileFormat=16)                    # FileFormat=16 is for .docx
-        doc.Close()
+        get_word_pool().convert(file_path, output_path)
         logging.info(f"Conversion successful: {output_path}")
 
     except Exception as e:
-        logging.info(f"An error occurred during conversion: {e}")
-    finally:
-        word.Quit()
\ No newline at end of file
+        logging.error(f"An error occurred during conversion: {e}")
+        raise
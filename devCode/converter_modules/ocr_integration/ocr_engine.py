@@ -0,0 +1,129 @@
+import abc
+import queue
+import atexit
+import logging
+import threading
+
+ENGINE_AUTO = 'auto'
+ENGINE_TESSEROCR = 'tesserocr'
+ENGINE_PYTESSERACT = 'pytesseract'
+
+OCR_LANGUAGE = 'eng'
+
+_ocr_backends = {}
+_ocr_backends_lock = threading.Lock()
+
+
+class OcrBackend(abc.ABC):
+    """Interface to the engine that reads the text of an image."""
+
+    name = None
+
+    @abc.abstractmethod
+    def image_to_string(self, image):
+        """Return the text of a PIL image."""
+
+    @abc.abstractmethod
+    def version(self):
+        """Engine version, part of the OCR cache key."""
+
+    def close(self):
+        pass
+
+
+class PytesseractBackend(OcrBackend):
+    """The tesseract command line through pytesseract: a new process, model load and temp file per image."""
+
+    name = ENGINE_PYTESSERACT
+
+    def __init__(self):
+        import pytesseract
+
+        self.pytesseract = pytesseract
+
+    def image_to_string(self, image):
+        return self.pytesseract.image_to_string(image=image, lang=OCR_LANGUAGE)
+
+    def version(self):
+        return str(self.pytesseract.get_tesseract_version())
+
+
+class TesserocrBackend(OcrBackend):
+    """
+    Tesseract in process through tesserocr. Engines are created with the language model loaded once and
+    kept warm for the life of the worker process; each call checks one out, so concurrent OCR threads
+    never share an engine. Images are handed over in memory.
+    """
+
+    name = ENGINE_TESSEROCR
+
+    def __init__(self):
+        import tesserocr
+
+        self.tesserocr = tesserocr
+        self.idle_engines = queue.LifoQueue()
+        self.engines = []
+        self.lock = threading.Lock()
+
+    def checkout(self):
+        try:
+            return self.idle_engines.get_nowait()
+        except queue.Empty:
+            engine = self.tesserocr.PyTessBaseAPI(lang=OCR_LANGUAGE)
+            with self.lock:
+                self.engines.append(engine)
+            logging.info(f'Started tesseract engine {len(self.engines)} in process')
+            return engine
+
+    def image_to_string(self, image):
+        engine = self.checkout()
+        try:
+            engine.SetImage(image)
+            dpi = image.info.get('dpi')
+            if dpi and dpi[0]:
+                engine.SetSourceResolution(int(dpi[0]))
+            return engine.GetUTF8Text()
+        finally:
+            engine.Clear()
+            self.idle_engines.put(engine)
+
+    def version(self):
+        return self.tesserocr.tesseract_version().splitlines()[0]
+
+    def close(self):
+        with self.lock:
+            for engine in self.engines:
+                engine.End()
+            self.engines = []
+        self.idle_engines = queue.LifoQueue()
+
+
+def create_ocr_backend(engine):
+    """Create the backend for engine; auto and an unavailable tesserocr fall back to pytesseract."""
+    if engine in (ENGINE_AUTO, ENGINE_TESSEROCR):
+        try:
+            return TesserocrBackend()
+        except ImportError as e:
+            log = logging.warning if engine == ENGINE_TESSEROCR else logging.info
+            log(f'tesserocr not available ({e}), using pytesseract for OCR')
+    elif engine != ENGINE_PYTESSERACT:
+        raise ValueError(f'Unknown OCR engine: {engine}')
+    return PytesseractBackend()
+
+
+def get_ocr_backend(engine=ENGINE_AUTO):
+    """Return this process's backend for engine, creating it on first use."""
+    with _ocr_backends_lock:
+        if engine not in _ocr_backends:
+            _ocr_backends[engine] = create_ocr_backend(engine)
+        return _ocr_backends[engine]
+
+
+def shutdown_ocr_backends():
+    with _ocr_backends_lock:
+        for backend in _ocr_backends.values():
+            backend.close()
+        _ocr_backends.clear()
+
+
+atexit.register(shutdown_ocr_backends)
@@ -0,0 +1,261 @@
+import io
+import re
+from collections import namedtuple
+from operator import itemgetter
+import pdfplumber
+from pdfplumber.utils import cluster_objects
+from docx import Document
+from docx.shared import Pt
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from logs.logs_handler import get_logger
+
+logger = get_logger(__name__)
+
+# A page needs this many visible characters to count as having a text layer
+MIN_PAGE_CHARS = 25
+# Share of a page images may cover; a scanned page is an image over the whole page,
+# usually with an OCR text layer on top that is no better than our own OCR
+MAX_IMAGE_COVERAGE = 0.6
+# Share of characters that may have no font or no Unicode mapping, such as "(cid:12)"
+MAX_UNREADABLE_CHARS = 0.02
+
+# Words whose tops are this close (points) are on the same line
+LINE_TOLERANCE = 3
+# A gap between lines larger than this share of the line height starts a new paragraph
+PARAGRAPH_GAP = 0.8
+# A line whose middle is this close (points) to the middle of the page is centred
+CENTRE_TOLERANCE = 6
+# A line starting with a capitalised label of up to six words and a colon, such as 'Subject:' or
+# 'Title of Rule:', starts a new paragraph even when it follows the previous line at a normal gap
+LABEL_LINE_PATTERN = re.compile(r"[A-Z][\w'&/().,-]*(?: [\w'&/().,-]+){0,5}:(?:\s|$)")
+
+TextLayerReport = namedtuple('TextLayerReport', ['reliable', 'reason'])
+
+
+def is_unreadable_char(char):
+    text = char['text']
+    return (not char.get('fontname') or text.startswith('(cid:') or '\ufffd' in text
+            or any(0xE000 <= ord(c) <= 0xF8FF for c in text))
+
+
+def image_coverage(page):
+    """Share of the page area under images, with overlapping images counted once per image."""
+    page_area = float(page.width * page.height) or 1.0
+    covered = 0.0
+    for image in page.images:
+        width = min(image['x1'], page.width) - max(image['x0'], 0)
+        height = min(image['bottom'], page.height) - max(image['top'], 0)
+        if width > 0 and height > 0:
+            covered += width * height
+    return min(covered / page_area, 1.0)
+
+
+def assess_page(page):
+    """Return why the text layer of the page cannot be used, or None when it is reliable."""
+    visible = [char for char in page.chars if not char['text'].isspace()]
+    if len(visible) < MIN_PAGE_CHARS:
+        return f'page {page.page_number} has {len(visible)} characters'
+    unreadable = sum(map(is_unreadable_char, visible))
+    if unreadable > MAX_UNREADABLE_CHARS * len(visible):
+        return f'page {page.page_number} has {unreadable} of {len(visible)} characters without a font or Unicode mapping'
+    coverage = image_coverage(page)
+    if coverage > MAX_IMAGE_COVERAGE:
+        return f'page {page.page_number} is {coverage:.0%} covered by images'
+    return None
+
+
+def font_style(word):
+    fontname = (word.get('fontname') or '').lower()
+    bold = any(weight in fontname for weight in ('bold', 'black', 'heavy', 'semibold'))
+    italic = 'italic' in fontname or 'oblique' in fontname
+    return bold, italic, round(word['size'] * 2) / 2
+
+
+def inside_any(obj, boxes):
+    centre_x = (obj['x0'] + obj['x1']) / 2
+    centre_y = (obj['top'] + obj['bottom']) / 2
+    return any(x0 <= centre_x <= x1 and top <= centre_y <= bottom for x0, top, x1, bottom in boxes)
+
+
+def read_page_lines(page, table_boxes):
+    """Lines of words outside the tables, top to bottom, each word carrying its font."""
+    words = [word for word in page.extract_words(extra_attrs=['fontname', 'size']) if not inside_any(word, table_boxes)]
+    lines = []
+    for cluster in cluster_objects(words, itemgetter('top'), LINE_TOLERANCE):
+        cluster = sorted(cluster, key=itemgetter('x0'))
+        lines.append({
+            'words': cluster,
+            'top': min(word['top'] for word in cluster),
+            'bottom': max(word['bottom'] for word in cluster),
+            'x0': cluster[0]['x0'],
+            'x1': cluster[-1]['x1'],
+            'bold': all(font_style(word)[0] for word in cluster),
+        })
+    return lines
+
+
+def image_bounds(image_object):
+    # get_pos before pypdfium2 5
+    bounds = getattr(image_object, 'get_bounds', None) or image_object.get_pos
+    return bounds()
+
+
+def read_page_images(pdfium_page, page_height):
+    """Images of a page as (top, width in points, PNG bytes), read through pdfium."""
+    import pypdfium2.raw as pdfium_raw
+
+    images = []
+    for image_object in pdfium_page.get_objects(filter=(pdfium_raw.FPDF_PAGEOBJ_IMAGE,)):
+        try:
+            left, bottom, right, top = image_bounds(image_object)
+            png = io.BytesIO()
+            image_object.get_bitmap(render=False).to_pil().save(png, 'PNG')
+            images.append((page_height - top, right - left, png.getvalue()))
+        except Exception as e:
+            logger.warning(f'Skipped an image that could not be read: {e}')
+    return images
+
+
+def is_label_line(line):
+    return LABEL_LINE_PATTERN.match(' '.join(word['text'] for word in line['words'])) is not None
+
+
+def group_paragraphs(lines):
+    """
+    Split the lines of a block of text into paragraphs at wider gaps, at changes to or from bold lines
+    and before label lines of forms, such as 'Subject:'.
+    """
+    paragraphs = []
+    previous = None
+    for line in lines:
+        height = previous['bottom'] - previous['top'] if previous else 0
+        if (previous is None or line['top'] - previous['bottom'] > PARAGRAPH_GAP * height
+                or line['bold'] != previous['bold'] or is_label_line(line)):
+            paragraphs.append([])
+        paragraphs[-1].append(line)
+        previous = line
+    return paragraphs
+
+
+class DocxBuilder:
+    """Writes the pages of a PDF into a DOCX, starting each page on a new page."""
+
+    def __init__(self):
+        self.document = Document()
+        self.page_started = False
+        self.first_page = True
+
+    def start_page(self, page):
+        if self.first_page:
+            section = self.document.sections[0]
+            section.page_width = Pt(page.width)
+            section.page_height = Pt(page.height)
+        self.page_started = False
+
+    def new_paragraph(self):
+        paragraph = self.document.add_paragraph()
+        if not self.page_started:
+            if not self.first_page:
+                paragraph.paragraph_format.page_break_before = True
+            self.page_started = True
+            self.first_page = False
+        return paragraph
+
+    def add_text(self, lines, page_width):
+        paragraph = self.new_paragraph()
+        if all(abs((line['x0'] + line['x1']) / 2 - page_width / 2) <= CENTRE_TOLERANCE for line in lines):
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        runs = []
+        for line in lines:
+            for word in line['words']:
+                style = font_style(word)
+                if runs and runs[-1][0] == style:
+                    runs[-1][1].append(word['text'])
+                else:
+                    if runs:
+                        runs[-1][1].append('')
+                    runs.append((style, [word['text']]))
+        for (bold, italic, size), words in runs:
+            run = paragraph.add_run(' '.join(words))
+            run.bold = bold or None
+            run.italic = italic or None
+            run.font.size = Pt(size)
+
+    def add_table(self, rows):
+        if not self.page_started:
+            if self.first_page:
+                self.page_started, self.first_page = True, False
+            else:
+                # The page break is carried by an empty paragraph before the table
+                self.new_paragraph()
+        columns = max(len(row) for row in rows)
+        table = self.document.add_table(rows=len(rows), cols=columns)
+        table.style = 'Table Grid'
+        for row, values in zip(table.rows, rows):
+            for cell, value in zip(row.cells, values):
+                cell.text = value or ''
+
+    def add_image(self, width, png):
+        run = self.new_paragraph().add_run()
+        run.add_picture(io.BytesIO(png), width=Pt(width))
+
+    def add_page(self, page, pdfium_page=None):
+        """Add the text, tables and images of a page in reading order, top to bottom."""
+        self.start_page(page)
+        tables = [table for table in page.find_tables() if table.bbox]
+        table_boxes = [table.bbox for table in tables]
+
+        blocks = [(line['top'], 'line', line) for line in read_page_lines(page, table_boxes)]
+        blocks += [(table.bbox[1], 'table', table.extract()) for table in tables]
+        if pdfium_page is not None:
+            blocks += [(top, 'image', (width, png)) for top, width, png in read_page_images(pdfium_page, page.height)]
+        blocks.sort(key=itemgetter(0))
+
+        text_lines = []
+        for _, kind, block in blocks + [(None, 'end', None)]:
+            if kind == 'line':
+                text_lines.append(block)
+                continue
+            for lines in group_paragraphs(text_lines):
+                self.add_text(lines, page.width)
+            text_lines = []
+            if kind == 'table' and block:
+                self.add_table(block)
+            elif kind == 'image':
+                self.add_image(*block)
+
+    def save(self, output_path):
+        self.document.save(output_path)
+
+
+def Run(file_path, output_path):
+    """
+    Build the DOCX at output_path from the text layer of a born-digital PDF, with paragraphs, bold and
+    italic runs, tables and images. Pages are checked as they are read, so a scanned PDF is given up on
+    at its first page. Returns a TextLayerReport; nothing is written unless the text layer is reliable.
+    """
+    builder = DocxBuilder()
+    pdfium_document = None
+    try:
+        with pdfplumber.open(file_path) as pdf:
+            if not pdf.pages:
+                return TextLayerReport(False, 'no pages')
+            for page in pdf.pages:
+                reason = assess_page(page)
+                if reason:
+                    return TextLayerReport(False, reason)
+                pdfium_page = None
+                if page.images:
+                    if pdfium_document is None:
+                        import pypdfium2 as pdfium
+                        pdfium_document = pdfium.PdfDocument(file_path)
+                    pdfium_page = pdfium_document[page.page_number - 1]
+                builder.add_page(page, pdfium_page)
+                page.close()
+    finally:
+        if pdfium_document is not None:
+            pdfium_document.close()
+
+    builder.save(output_path)
+    logger.info(f'Built DOCX from the text layer of {file_path}')
+    return TextLayerReport(True, 'text layer')
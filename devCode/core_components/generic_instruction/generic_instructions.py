@@ -1,15 +1,19 @@
 from docx import Document
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_UNDERLINE
 from docx.shared import Pt, Cm , Inches
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
-from lxml.etree import QName
+from lxml.etree import QName, XPath
 import re
 import comtypes.client
+from functools import partial
 import os
 import time
 # from devCode import FormatTableStyle, RemoveTable , RemoveSectionBreaks, CheckSmallCapsFunction
 # from devCode import replace_bullets 
+from core_components.generic_instruction.text_normalizer import (
+    normalize_paragraph_text, excluded_run_indexes, excluded_text_pattern
+)
 from logs.logs_handler import get_logger
 
 
@@ -17,10 +21,59 @@ logger = get_logger(__name__)
 
 
 
-# Precompile the regular expressions
-email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
-url_pattern = re.compile(r'\b(?:https?://|www\.)\S+\b')
-doc_link_pattern = re.compile(r'\b\S+\.(com|gov|aspx|html|txt|rtf|pdf|doc|docx|xls|xlsx)\b')
+# 'HYPERLINK' anywhere in the text or attribute values of a run, tested without serializing it
+hyperlink_in_run = XPath('contains(., "HYPERLINK") or boolean(descendant-or-self::*/@*[contains(., "HYPERLINK")])')
+
+FORMATTING_DIRECT = 'direct'
+FORMATTING_STYLE = 'style'
+
+FONT_NAME = 'Times New Roman'
+FONT_SIZE_HALF_POINTS = '24'                # 12 pt as written in w:sz
+PARAGRAPH_SPACING = '60'                    # 3 pt in twips as written in w:spacing
+
+W_P = qn('w:p')
+W_R = qn('w:r')
+W_T = qn('w:t')
+W_TAB = qn('w:tab')
+W_BR = qn('w:br')
+W_TBL = qn('w:tbl')
+W_TR = qn('w:tr')
+W_TC = qn('w:tc')
+W_TCPR = qn('w:tcPr')
+W_VMERGE = qn('w:vMerge')
+W_PPR = qn('w:pPr')
+W_JC = qn('w:jc')
+W_SPACING = qn('w:spacing')
+W_IND = qn('w:ind')
+W_RPR = qn('w:rPr')
+W_SZ = qn('w:sz')
+W_RFONTS = qn('w:rFonts')
+W_DRAWING = qn('w:drawing')
+W_VAL = qn('w:val')
+W_ASCII = qn('w:ascii')
+W_HANSI = qn('w:hAnsi')
+W_EAST_ASIA = qn('w:eastAsia')
+W_BEFORE = qn('w:before')
+W_AFTER = qn('w:after')
+W_LEFT = qn('w:left')
+W_RIGHT = qn('w:right')
+W_FIRST_LINE = qn('w:firstLine')
+W_HANGING = qn('w:hanging')
+W_NUMPR = qn('w:numPr')
+W_PSTYLE = qn('w:pStyle')
+W_STYLE = qn('w:style')
+W_STYLE_ID = qn('w:styleId')
+W_TYPE = qn('w:type')
+W_DEFAULT = qn('w:default')
+W_BASED_ON = qn('w:basedOn')
+W_TBL_STYLE_PR = qn('w:tblStylePr')
+W_DOC_DEFAULTS = qn('w:docDefaults')
+W_RPR_DEFAULT = qn('w:rPrDefault')
+W_PPR_DEFAULT = qn('w:pPrDefault')
+HOUSE_FONT_ATTRIBUTES = (W_ASCII, W_HANSI, W_EAST_ASIA, qn('w:asciiTheme'), qn('w:hAnsiTheme'), qn('w:eastAsiaTheme'))
+THEME_FONT_ATTRIBUTES = HOUSE_FONT_ATTRIBUTES[3:]
+PARAGRAPH_INDENT_ATTRIBUTES = (W_LEFT, W_FIRST_LINE, W_HANGING)
+XML_SPACE = qn('xml:space')
 
 
 def format_document(doc_path,region_code = None):
@@ -30,29 +83,40 @@ def format_document(doc_path,region_code = None):
     # Load the document
     doc = Document(doc_path)
 
-    # Apply formatting to all paragraphs
-    for paragraph in doc.paragraphs:
-        format_paragraph(paragraph)
-        align_paragraph(paragraph)
-        apply_bullet_formatting(paragraph)
-
-    # Apply formatting to all tables
-    for table in doc.tables:
-        indent_table_left(table)
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    format_paragraph(paragraph)
-                    align_paragraph(paragraph)
-                    apply_bullet_formatting(paragraph)
-
-    # remove_spacing_between_paras(doc)
-    # remove_tabs_from_document(doc)
+    apply_document_formatting(doc, region_code)
     
     # Save the modified document
     doc.save(doc_path)
     logger.info(f" Formatted document and saved: {doc_path}")
 
+
+def apply_document_formatting(doc, region_code=None, mode=FORMATTING_DIRECT):
+    """
+    Apply the generic formatting rules and margins/indentation to a loaded document.
+    Every body paragraph, table and run is visited once on the lxml tree with all rules applied together.
+
+    In 'direct' mode the house font, spacing and indentation are written into every run and paragraph.
+    In 'style' mode they are set once in the document defaults and the Normal and table styles, and
+    direct formatting that would override them is removed.
+    """
+    if mode == FORMATTING_STYLE:
+        numbered_styles = apply_house_styles(doc)
+        format_paragraph = partial(format_styled_paragraph_element, numbered_styles=numbered_styles)
+    elif mode == FORMATTING_DIRECT:
+        format_paragraph = format_paragraph_element
+    else:
+        raise ValueError(f"Unknown formatting mode: {mode}")
+
+    body = doc.element.body
+    for element in body.iterchildren():
+        if element.tag == W_P:
+            format_paragraph(element, body_paragraph=True)
+        elif element.tag == W_TBL:
+            format_table_element(element, format_paragraph)
+
+    # remove_spacing_between_paras(doc)
+    # remove_tabs_from_document(doc)
+
     # custom call functions
     # FormatTableStyle.add_border_doc(doc_path,doc_path)        #adds border to all the table elements
     # RemoveTable.replace_image_with_text(doc_path,"{Non Displayable Image}",doc_path)       # replaces image with "{Non Displayable Image}"
@@ -63,109 +127,311 @@ def format_document(doc_path,region_code = None):
     # # remove_header_footer_sections(doc_path,region_code)
     # CheckSmallCapsFunction.check_small_caps(doc_path)
     # RemoveSectionBreaks.remove_section_breaks(doc_path)
-    word_file_indentation(doc_path)                             
-    
-def is_excluded_text(text):
-    return email_pattern.search(text) or url_pattern.search(text) or doc_link_pattern.search(text)
+    set_document_margins(doc)
 
 
-def format_paragraph(paragraph):
+def format_table_element(tbl, format_paragraph=None):
     """
-    Apply specific formatting to a paragraph. Remove hyperlink text (but not images), apply text font and style.
+    Indent a w:tbl to the left and format the paragraphs of its cells.
+    Cells continuing a vertical merge are skipped, their content belongs to the cell above.
     """
-    replacements = {
-        '–': '~#8211;',
-        '§': '~#167;',
-        ' ,': ',',
-        '°': '~#176;',
-        '•': '~#8226;',
-        '✓': '/',
-        '☒': '[x]',
-        '→': '-->'
-    }
-
-    # # Accumulate text from all runs to process leading spaces
-    # full_text = ''.join(run.text for run in paragraph.runs)
-    # stripped_text = full_text.lstrip()
-
-    # # Determine the amount of leading whitespace removed
-    # leading_spaces_removed = len(full_text) - len(stripped_text)
-
-    # # Update runs with the stripped text
-    # remaining_text = stripped_text
-    # for run in paragraph.runs:
-    #     # Check if the run contains an image
-    #     if run._element.findall('.//w:drawing', namespaces=paragraph._element.nsmap):
-    #         continue  # Skip this run if it contains an image
-
-    #     if leading_spaces_removed > 0:
-    #         run_text_length = len(run.text)
-    #         if run_text_length <= leading_spaces_removed:
-    #             run.text = ''
-    #             leading_spaces_removed -= run_text_length
-    #         else:
-    #             run.text = run.text[leading_spaces_removed:]
-    #             leading_spaces_removed = 0
-    #     if remaining_text:
-    #         run.text = remaining_text[:len(run.text)]
-    #         remaining_text = remaining_text[len(run.text):]
-
-    # # Replace text according to the replacements dictionary
-    # for old_text, new_text in replacements.items():
-    #     if old_text in paragraph.text:
-    #         inline = paragraph.runs
-    #         for run in inline:
-    #             run.text = run.text.replace(old_text, new_text)
-
-    for run in paragraph.runs:
-        # Check if the run contains an image
-        if run._element.findall('.//w:drawing', namespaces=paragraph._element.nsmap):
-            continue  # Skip this run if it contains an image
+    format_paragraph = format_paragraph or format_paragraph_element
+    indent_table_element_left(tbl)
+    for tr in tbl.iterchildren(W_TR):
+        for tc in tr.iterchildren(W_TC):
+            tcPr = tc.find(W_TCPR)
+            vMerge = tcPr.find(W_VMERGE) if tcPr is not None else None
+            if vMerge is not None and vMerge.get(W_VAL, 'continue') == 'continue':
+                continue
+            for p in tc.iterchildren(W_P):
+                format_paragraph(p)
+
+
+def format_paragraph_element(p, body_paragraph=False):
+    """
+    Format the runs of a w:p and set its alignment, spacing and indentation.
+    Body paragraphs also lose their right indent. Bullet paragraphs need no extra step since every
+    paragraph gets a zero left and first-line indent.
+    """
+    format_paragraph_runs(p)
+
+    pPr = p.find(W_PPR)
+    if pPr is None:
+        pPr = p.get_or_add_pPr()
+
+    jc = pPr.find(W_JC)
+    if jc is None or jc.get(W_VAL) != 'left':
+        pPr.jc_val = WD_ALIGN_PARAGRAPH.LEFT
+
+    spacing = pPr.find(W_SPACING)
+    if spacing is None or spacing.get(W_BEFORE) != PARAGRAPH_SPACING or spacing.get(W_AFTER) != PARAGRAPH_SPACING:
+        pPr.spacing_before = Pt(3)
+        pPr.spacing_after = Pt(3)
+
+    ind = pPr.find(W_IND)
+    if ind is None or ind.get(W_LEFT) != '0':
+        pPr.ind_left = Cm(0)
+        ind = pPr.find(W_IND)
+    if body_paragraph and ind.get(W_RIGHT) != '0':
+        pPr.ind_right = Inches(0)
+
+    # Setting the first-line indent moves w:firstLine to the end of w:ind, so only a trailing zero is conforming
+    if ind.get(W_HANGING) is not None or ind.attrib.keys()[-1] != W_FIRST_LINE or ind.get(W_FIRST_LINE) != '0':
+        pPr.first_line_indent = Cm(0)
+
 
-        if 'HYPERLINK' in run.element.xml:
-            run.clear()  # Remove the hyperlink text
+def format_paragraph_runs(p, format_font=None):
+    """
+    Apply the run rules of format_paragraph to the runs of a w:p. The paragraph text is normalized in
+    one pass and mapped back onto the runs; runs whose text and font already conform are left untouched.
+    format_font(r) handles the font of each run and defaults to set_run_font.
+    """
+    format_font = format_font or set_run_font
+    runs = []
+    for r in p.iterchildren(W_R):
+        if next(r.iter(W_DRAWING), None) is not None:
+            continue  # Skip this run if it contains an image
 
-        if is_excluded_text(run.text):
-            run.font.underline = False  # Remove underline if the text matches the exclusion criteria
+        if hyperlink_in_run(r):
+            r.clear_content()  # Remove the hyperlink text
 
-        # replacing starting " with " and ending " with " and replacing all ' with ' 
-        text = run.text
-        text = re.sub(r'"(\b)', r'“\1', text)
-        text = re.sub(r'(\b)"', r'”\1', text)
-        text = re.sub(r'"([.,!?;:)\s]|$)', r'”\1', text)
-        text = text.replace("'", "’")
-        run.text = text
+        text, plain_content = read_run_text(r)
+        runs.append((r, text, plain_content))
 
-        # run.font.underline = False  # This will make all the underlines disappear
-        run.font.size = Pt(12)
-        run.font.name = 'Times New Roman'
-        run._element.rPr.rFonts.set(qn('w:eastAsia'), 'Times New Roman')
+    texts = [text for r, text, plain_content in runs]
+    for index in excluded_run_indexes(texts):
+        runs[index][0].get_or_add_rPr().u_val = WD_UNDERLINE.NONE  # Remove underline if the text matches the exclusion criteria
 
+    for (r, text, plain_content), new_text in zip(runs, normalize_paragraph_text(texts)):
+        if new_text != text or not plain_content:
+            r.text = new_text
+        format_font(r)
 
 
-def align_paragraph(paragraph):
+def set_run_font(r):
+    """
+    Set Times New Roman 12 pt on a w:r element unless it already has it.
+    """
+    rPr = r.find(W_RPR)
+    if rPr is not None:
+        sz = rPr.find(W_SZ)
+        rFonts = rPr.find(W_RFONTS)
+        if (sz is not None and sz.get(W_VAL) == FONT_SIZE_HALF_POINTS and rFonts is not None
+                and rFonts.get(W_ASCII) == FONT_NAME and rFonts.get(W_HANSI) == FONT_NAME
+                and rFonts.get(W_EAST_ASIA) == FONT_NAME):
+            return
+    else:
+        rPr = r.get_or_add_rPr()
+
+    rPr.sz_val = Pt(12)
+    rPr.rFonts_ascii = FONT_NAME
+    rPr.rFonts_hAnsi = FONT_NAME
+    rPr.rFonts.set(W_EAST_ASIA, FONT_NAME)
+
+
+def apply_house_styles(doc):
+    """
+    Put the house font, size, alignment, spacing and indentation in the document defaults, the default
+    paragraph style and the table styles, and remove them from every other style so those inherit them.
+    Returns the ids of the paragraph styles that carry numbering.
     """
-    Align the paragraph and set indentation.
+    styles = doc.styles.element
+    rPr, pPr = get_or_add_doc_defaults(styles)
+    set_house_run_properties(rPr)
+    set_house_paragraph_properties(pPr)
+
+    for style in styles.iterchildren(W_STYLE):
+        style_type = style.get(W_TYPE)
+        if style_type == 'table' or (style_type == 'paragraph' and style.get(W_DEFAULT) in ('1', 'true', 'on')):
+            set_house_run_properties(style.get_or_add_rPr())
+            set_house_paragraph_properties(style.get_or_add_pPr())
+            # Conditional table formatting (header row, banding) would override the table style itself
+            for conditional in style.iterchildren(W_TBL_STYLE_PR):
+                strip_house_properties(conditional)
+        else:
+            strip_house_properties(style)
+
+    return get_numbered_styles(styles)
+
+
+def get_or_add_doc_defaults(styles):
+    """Return the w:rPr and w:pPr of w:docDefaults, creating the elements that are missing."""
+    doc_defaults = styles.find(W_DOC_DEFAULTS)
+    if doc_defaults is None:
+        doc_defaults = OxmlElement('w:docDefaults')
+        styles.insert(0, doc_defaults)
+
+    rPr_default = doc_defaults.find(W_RPR_DEFAULT)
+    if rPr_default is None:
+        rPr_default = OxmlElement('w:rPrDefault')
+        doc_defaults.insert(0, rPr_default)
+    pPr_default = doc_defaults.find(W_PPR_DEFAULT)
+    if pPr_default is None:
+        pPr_default = OxmlElement('w:pPrDefault')
+        rPr_default.addnext(pPr_default)
+
+    for default in (rPr_default, pPr_default):
+        if len(default) == 0:
+            default.append(OxmlElement('w:rPr' if default is rPr_default else 'w:pPr'))
+    return rPr_default[0], pPr_default[0]
+
+
+def set_house_run_properties(rPr):
+    """Times New Roman 12 pt; theme fonts are removed because they take precedence over named fonts."""
+    rPr.sz_val = Pt(12)
+    rPr.rFonts_ascii = FONT_NAME
+    rFonts = rPr.rFonts
+    rFonts.set(W_HANSI, FONT_NAME)
+    rFonts.set(W_EAST_ASIA, FONT_NAME)
+    for attribute in THEME_FONT_ATTRIBUTES:
+        rFonts.attrib.pop(attribute, None)
+
+
+def set_house_paragraph_properties(pPr):
+    """Left aligned, 3 pt before and after, no indentation."""
+    pPr.jc_val = WD_ALIGN_PARAGRAPH.LEFT
+    pPr.spacing_before = Pt(3)
+    pPr.spacing_after = Pt(3)
+    pPr.ind_left = Cm(0)
+    pPr.ind_right = Cm(0)
+    pPr.first_line_indent = Cm(0)
+
+
+def strip_house_properties(element):
+    """Remove the house properties from the w:rPr and w:pPr children of a style or conditional format."""
+    rPr = element.find(W_RPR)
+    if rPr is not None:
+        strip_run_font(rPr, remove_empty=False)
+    pPr = element.find(W_PPR)
+    if pPr is not None:
+        strip_paragraph_properties(pPr, strip_right_indent=True)
+
+
+def get_numbered_styles(styles):
+    """Ids of the paragraph styles with numbering, directly or through the styles they are based on."""
+    based_on = {}
+    numbered = set()
+    for style in styles.iterchildren(W_STYLE):
+        style_id = style.get(W_STYLE_ID)
+        parent = style.find(W_BASED_ON)
+        based_on[style_id] = parent.get(W_VAL) if parent is not None else None
+        pPr = style.find(W_PPR)
+        if pPr is not None and pPr.find(W_NUMPR) is not None:
+            numbered.add(style_id)
+
+    changed = True
+    while changed:
+        changed = False
+        for style_id, parent_id in based_on.items():
+            if parent_id in numbered and style_id not in numbered:
+                numbered.add(style_id)
+                changed = True
+    return numbered
+
+
+def format_styled_paragraph_element(p, body_paragraph=False, numbered_styles=()):
     """
-    paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-    paragraph.paragraph_format.space_before = Pt(3)
-    paragraph.paragraph_format.space_after = Pt(3)
-    paragraph.paragraph_format.left_indent = Cm(0)
-    paragraph.paragraph_format.first_line_indent = Cm(0)
+    Style mode counterpart of format_paragraph_element: the runs get the text rules, and the font,
+    alignment, spacing and indentation written directly on the paragraph are removed so the house
+    styles apply. Numbered paragraphs keep a direct zero indent, which overrides the numbering definition.
+    """
+    format_paragraph_runs(p, strip_run_font)
+
+    pPr = p.find(W_PPR)
+    if pPr is None:
+        return
+
+    pStyle = pPr.find(W_PSTYLE)
+    numbered = pPr.find(W_NUMPR) is not None or (pStyle is not None and pStyle.get(W_VAL) in numbered_styles)
+    strip_paragraph_properties(pPr, strip_right_indent=body_paragraph)
+    if numbered:
+        pPr.ind_left = Cm(0)
+        pPr.first_line_indent = Cm(0)
 
-def apply_bullet_formatting(paragraph):
+
+def strip_run_font(r, remove_empty=True):
+    """
+    Remove the font name and size set on a w:r (or directly on a w:rPr) so the house style applies.
+    Other font attributes, such as the complex script font, are kept.
     """
-    Apply bullet formatting if the paragraph is part of a bullet list.
+    rPr = r if r.tag == W_RPR else r.find(W_RPR)
+    if rPr is None:
+        return
+
+    rFonts = rPr.find(W_RFONTS)
+    if rFonts is not None:
+        for attribute in HOUSE_FONT_ATTRIBUTES:
+            rFonts.attrib.pop(attribute, None)
+        if not rFonts.attrib:
+            rPr.remove(rFonts)
+    sz = rPr.find(W_SZ)
+    if sz is not None:
+        rPr.remove(sz)
+
+    if remove_empty and len(rPr) == 0 and not rPr.attrib:
+        r.remove(rPr)
+
+
+def strip_paragraph_properties(pPr, strip_right_indent=False):
+    """Remove the alignment, spacing before/after and indentation from a w:pPr."""
+    jc = pPr.find(W_JC)
+    if jc is not None:
+        pPr.remove(jc)
+
+    for tag, attributes in ((W_SPACING, (W_BEFORE, W_AFTER)), (W_IND, PARAGRAPH_INDENT_ATTRIBUTES)):
+        element = pPr.find(tag)
+        if element is None:
+            continue
+        for attribute in attributes:
+            element.attrib.pop(attribute, None)
+        if strip_right_indent and tag == W_IND:
+            element.attrib.pop(W_RIGHT, None)
+        if not element.attrib:
+            pPr.remove(element)
+
+
+def read_run_text(r):
     """
-    if paragraph._element.xpath('.//w:numPr'):
-        paragraph.paragraph_format.left_indent = Cm(0)
-        paragraph.paragraph_format.first_line_indent = Cm(0)
+    Return the text of a w:r and whether its content is exactly what setting that text would write
+    (w:t, w:tab and plain w:br elements only). Other content is rewritten, as assigning run.text does.
+    """
+    parts = []
+    plain_content = True
+    previous_t = False
+    for child in r:
+        tag = child.tag
+        if tag == W_RPR:
+            continue
+        if tag == W_T:
+            text = child.text or ''
+            expected_attrib = {XML_SPACE: 'preserve'} if len(text.strip()) < len(text) else {}
+            if previous_t or not text or '\t' in text or '\n' in text or '\r' in text or dict(child.attrib) != expected_attrib:
+                plain_content = False
+            parts.append(text)
+            previous_t = True
+            continue
+        previous_t = False
+        if tag == W_TAB and not child.attrib:
+            parts.append('\t')
+        elif tag == W_BR and not child.attrib:
+            parts.append('\n')
+        else:
+            plain_content = False
+            break
+
+    if not plain_content:
+        return r.text, False
+    return ''.join(parts), True
+
+
+def is_excluded_text(text):
+    return excluded_text_pattern.search(text)
+
 
-def indent_table_left(table):
+def indent_table_element_left(tbl):
     """
-    Indent the entire table to the left with 0 cm.
+    Set a zero left indent on a w:tbl element.
     """
-    tbl = table._element
     tblPr = tbl.tblPr
     if tblPr is None:
         tblPr = OxmlElement('w:tblPr')
@@ -280,25 +546,12 @@ def clean_up_temp_file(temp_file_path):
 #     logging.info(f"Tabs removed successfully")
 
 
-def word_file_indentation(doc_path):
-    """ This function is used to set margins and selectively add first-line indentation to the word file """
-    doc = Document(doc_path)
-    
+def set_document_margins(doc):
+    """ Set the left and right margins of every section """
     # Loop through all sections and set margins to 1 inch
     for section in doc.sections:
         section.left_margin = Inches(0.75)
         section.right_margin = Inches(0.75)
-    
-    # Loop through all paragraphs
-    for paragraph in doc.paragraphs:
-        # Remove any existing indentation
-        paragraph.paragraph_format.left_indent = Inches(0)
-        paragraph.paragraph_format.right_indent = Inches(0)
-        paragraph.paragraph_format.first_line_indent = Inches(0)
-    
-    doc.save(doc_path)
-    logger.info(f"Margins adjusted and selective first-line indentation applied to the document: {doc_path}")
-
 
 
 # def check_file_type_and_convert(input_file_path: str, output_doc_path: str):
@@ -0,0 +1,78 @@
+import re
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+
+# Characters written as entity codes or plain text equivalents in the output
+replacements = {
+    '–': '~#8211;',
+    '§': '~#167;',
+    '°': '~#176;',
+    '•': '~#8226;',
+    '✓': '/',
+    '☒': '[x]',
+    '→': '-->',
+    "'": '’',
+}
+translation_table = str.maketrans(replacements)
+
+# Opening quote before a word character; closing quote after a word character or before punctuation,
+# whitespace or the end of the paragraph; a space in front of a comma is removed
+text_edit_pattern = re.compile(r'(")(?=\w)|(?<=\w)"|"(?=[.,!?;:)\s]|$)|( )(?=,)')
+
+email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+url_pattern = re.compile(r'\b(?:https?://|www\.)\S+\b')
+doc_link_pattern = re.compile(r'\b\S+\.(com|gov|aspx|html|txt|rtf|pdf|doc|docx|xls|xlsx)\b')
+excluded_text_pattern = re.compile('|'.join(pattern.pattern for pattern in (email_pattern, url_pattern, doc_link_pattern)))
+
+
+def text_edit(match):
+    if match.group(1):
+        return '“'
+    if match.group(2):
+        return ''
+    return '”'
+
+
+def normalize_paragraph_text(texts):
+    """
+    Normalize the text of a paragraph given as the texts of its runs, and return the new text of each run.
+    Quotes are matched on the joined paragraph text, so a quote at a run boundary sees its neighbours;
+    a quote ending a run that no rule matches is closed, as it was when runs were normalized one by one.
+    Every edit replaces a single character, which keeps the run offsets valid.
+    """
+    joined = ''.join(texts)
+    edits = {match.start(): text_edit(match) for match in text_edit_pattern.finditer(joined)}
+    for end in accumulate(len(text) for text in texts):
+        if end and joined[end - 1] == '"' and end - 1 not in edits:
+            edits[end - 1] = '”'
+    if not edits:
+        return [text.translate(translation_table) for text in texts]
+
+    characters = list(joined)
+    for position, replacement in edits.items():
+        characters[position] = replacement
+
+    normalized = []
+    start = 0
+    for text in texts:
+        end = start + len(text)
+        normalized.append(''.join(characters[start:end]).translate(translation_table))
+        start = end
+    return normalized
+
+
+def excluded_run_indexes(texts):
+    """
+    Return the indexes of the runs holding part of an email address, URL or document link
+    found in the joined paragraph text.
+    """
+    joined = ''.join(texts)
+    ends = list(accumulate(len(text) for text in texts))
+    indexes = set()
+    for match in excluded_text_pattern.finditer(joined):
+        start, end = match.span()
+        for index in range(bisect_right(ends, start), bisect_left(ends, end) + 1):
+            if texts[index]:
+                indexes.add(index)
+    return sorted(indexes)
@@ -0,0 +1,54 @@
+from bisect import bisect_left
+
+
+# Phrases marking the section boundaries and the variants of CO documents, matched in lower-cased text
+TITLE_OF_RULE = 'title of rule'
+TITLE_OF_RULE_LABEL = 'title of rule:'
+RULE_NUMBER_LABEL = 'rule number:'
+SECRETARY_OF_STATE = 'secretary of state'
+STATEMENT_OF_BASIS = 'statement of basis and purpose'
+DIVISION_CONTACT_PHONE = 'division / contact / phone:'
+CID_CONTACT = 'compliance and innovation division (cid) / matt bohanan /'
+OCL_CONTACT = 'ocl / tiffani domokos and cassandra keller'
+
+CO_ANCHORS = (TITLE_OF_RULE, TITLE_OF_RULE_LABEL, RULE_NUMBER_LABEL, SECRETARY_OF_STATE, STATEMENT_OF_BASIS,
+              DIVISION_CONTACT_PHONE, CID_CONTACT, OCL_CONTACT)
+
+
+class AnchorScanner:
+    """
+    Find which of a fixed set of keywords occur in a text. A keyword containing another keyword
+    (like 'title of rule:' and 'title of rule') is only searched for when the shorter one was found,
+    as the output links of an Aho-Corasick automaton would report it.
+    """
+
+    def __init__(self, keywords=CO_ANCHORS):
+        self.keywords = tuple(keywords)
+        self.plan = []
+        for keyword in sorted(self.keywords, key=len):
+            contained = [other for other in self.keywords if other != keyword and other in keyword]
+            self.plan.append((keyword, max(contained, key=len) if contained else None))
+
+    def keywords_in(self, text):
+        """Set of the keywords found in text."""
+        found = set()
+        for keyword, contained in self.plan:
+            if (contained is None or contained in found) and keyword in text:
+                found.add(keyword)
+        return found
+
+    def build_table(self, texts):
+        """Map every keyword to the ascending positions of the texts containing it, in a single pass."""
+        table = {keyword: [] for keyword in self.keywords}
+        for position, text in enumerate(texts):
+            for keyword in self.keywords_in(text):
+                table[keyword].append(position)
+        return table
+
+
+co_anchor_scanner = AnchorScanner()
+
+
+def positions_from(positions, start=0):
+    """The positions at or after start, from an ascending list of positions."""
+    return positions[bisect_left(positions, start):]
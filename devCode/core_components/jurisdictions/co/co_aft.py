@@ -1,146 +1,191 @@
 from docx import Document
 import os
-import pdfplumber
-from fuzzywuzzy import fuzz 
+from functools import lru_cache
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
 from docx.shared import Pt, Cm
 import logging
+from common_func import pdf_text
+from core_components.jurisdictions.co.paragraph_index import ParagraphIndex
+from core_components.jurisdictions.co.anchor_scanner import TITLE_OF_RULE, SECRETARY_OF_STATE, STATEMENT_OF_BASIS, DIVISION_CONTACT_PHONE
+from core_components.jurisdictions.co.variant_classifier import classify_texts, prescan_variant
 
 
 
-def extract_text_from_pdf(input_file):
+def extract_text_from_pdf(input_file, text_backend=pdf_text.TEXT_BACKEND_PDFPLUMBER):
     """
     Extract text from a PDF file and return the text up to the first non-empty line after an empty line in the half-page of the first page.
+    Both views of the half page come from one word extraction over the characters of the first page; text_backend can be 'pypdfium2'.
     """
     # Get the basename and extension of the input file 
     basename, extension = os.path.splitext(input_file)
 
     # Check if 'aft' is in the basename and the file is a PDF
     if 'aft' in basename.lower().strip() and extension.lower() == '.pdf':
-        with pdfplumber.open(input_file) as pdf:
-            page_1 = pdf.pages[0]
-            half_page = page_1.crop((0, 0, page_1.width, page_1.height / 2 + 100))
-            text = half_page.extract_text(layout = True)
-            standard_text = half_page.extract_text()
-
-            # Split the text by 'Subject:'
-            lines = text.split('Subject:')[1].split('\n')
-            print(lines)
-
-            # Initialize variables to track state
-            found_empty_line = False
-            non_empty_line_after_empty = None
-
-            # Iterate through lines to find the first non-empty line after an empty line
-            for line in lines:
-                if found_empty_line:
-                    if line.strip():                                           # Check if the line is not empty or just whitespace
-                        non_empty_line_after_empty = line.strip()
-                        break
-                else:
-                    if not line.strip():                                        # Check if the line is empty or just whitespace
-                        found_empty_line = True
-
-            # Return the text up to the first non-empty line after an empty line
-            if non_empty_line_after_empty:
-                print(f'partly extracted text : {standard_text.split(non_empty_line_after_empty.strip())[0]}')
-                return standard_text.split(non_empty_line_after_empty.strip())[0]
+        page_1 = pdf_text.read_page_chars(input_file, 0, text_backend)
+        # Layout and plain text of the upper half of the page, from one word extraction
+        text, standard_text = pdf_text.text_views(page_1.chars, (0, 0, page_1.width, page_1.height / 2 + 100))
+
+        # Split the text by 'Subject:'
+        lines = text.split('Subject:')[1].split('\n')
+        print(lines)
+
+        # Initialize variables to track state
+        found_empty_line = False
+        non_empty_line_after_empty = None
+
+        # Iterate through lines to find the first non-empty line after an empty line
+        for line in lines:
+            if found_empty_line:
+                if line.strip():                                           # Check if the line is not empty or just whitespace
+                    non_empty_line_after_empty = line.strip()
+                    break
             else:
-                return ""
-            
+                if not line.strip():                                        # Check if the line is empty or just whitespace
+                    found_empty_line = True
+
+        # Return the text up to the first non-empty line after an empty line
+        if non_empty_line_after_empty:
+            print(f'partly extracted text : {standard_text.split(non_empty_line_after_empty.strip())[0]}')
+            return standard_text.split(non_empty_line_after_empty.strip())[0]
+        else:
+            return ""
+        
 
 
-def find_duplicate_sections(doc, doc_type):
+def find_duplicate_sections(paragraphs, doc_type):
     """
     Find potential duplicate sections in the document based on the document type.
+    paragraphs is the ParagraphIndex of the document.
     Returns:
     dict: A dictionary containing the text and index ranges of potential duplicate sections.
     """
     duplicate_info = {'text': [], 'index': []}
-    end_of_text_state_basis_index = []
 
     # Determine the end text lookup based on document type
-    end_text_lookup = 'secretary of state' if doc_type == 'TYPE 1' else 'statement of basis and purpose'
+    end_text_lookup = SECRETARY_OF_STATE if doc_type == 'TYPE 1' else STATEMENT_OF_BASIS
     
     # Find all occurrences of the end text
-    for i, para in enumerate(doc.paragraphs):
-        text = para.text.strip().lower()
-        if end_text_lookup in text:
-            end_of_text_state_basis_index.append(i)
+    end_of_text_state_basis_index = paragraphs.find_all(end_text_lookup)
     
     # For each end text occurrence, find the corresponding start ("title of rule")
     for n in end_of_text_state_basis_index:
-        for i in range(n-1, -1, -1):
-            text = doc.paragraphs[i].text.strip().lower()
-            if 'title of rule' in text:
-                duplicate_info['index'].append([i, n-1])
-                break
+        start = paragraphs.find_previous(TITLE_OF_RULE, n)
+        if start is not None:
+            duplicate_info['index'].append([start, n-1])
 
-        # Extract the text between start and end
-        search_text = " ".join([p.text.strip().replace('\t', '') for p in doc.paragraphs[i:n]]).strip()
+        # Extract the text between start and end, from the top when no title precedes it
+        search_text = " ".join(paragraphs.clean_texts[start or 0:n]).strip()
         duplicate_info['text'].append(search_text)
     return duplicate_info
 
 
 
-def find_duplicate_text(doc, start_index, search_text):
+# A candidate is a duplicate when its fuzzywuzzy ratio (rounded percentage) is above this score
+DUPLICATE_SCORE_THRESHOLD = 95
+
+
+@lru_cache(maxsize=None)
+def max_duplicate_distance(total_length):
+    """
+    Largest Indel distance at which two strings of this combined length still score above
+    DUPLICATE_SCORE_THRESHOLD, computed with the same rounding as fuzzywuzzy's fuzz.ratio.
+    """
+    if total_length == 0:
+        return 0
+    distance = total_length * (100 - DUPLICATE_SCORE_THRESHOLD) // 100 + 1
+    while int(round(100 * ((total_length - distance) / total_length))) <= DUPLICATE_SCORE_THRESHOLD:
+        distance -= 1
+    return distance
+
+
+def find_duplicate_window(search_text, match_text, window_texts):
+    """
+    Return the offset of the first window that matches search_text, or None.
+    Window k is the joined match_text followed by window_texts[0..k]. Windows whose length alone rules
+    out a match are skipped using the running lengths; the rest are scored in one rapidfuzz call that
+    stops each comparison once the allowed distance is exceeded.
+    """
+    search_length = len(search_text)
+    prefix = ''.join(match_text)
+    window_length = len(prefix)
+    candidates = []
+    for offset, text in enumerate(window_texts):
+        window_length += len(text)
+        # The Indel distance is at least the difference in length
+        if abs(window_length - search_length) <= max_duplicate_distance(window_length + search_length):
+            candidates.append((offset, window_length))
+    if not candidates:
+        return None
+
+    windows = [prefix + ''.join(window_texts[:offset + 1]) for offset, _ in candidates]
+    limits = [max_duplicate_distance(window_length + search_length) for _, window_length in candidates]
+    distances = process.cdist([search_text], windows, scorer=Indel.distance, score_cutoff=max(limits))[0]
+    for (offset, _), distance, limit in zip(candidates, distances, limits):
+        if distance <= limit:
+            return offset
+    return None
+
+
+def find_duplicate_text(paragraphs, start_index, search_text):
     """
     Find duplicate text in the document starting from a given index.
+    paragraphs is the ParagraphIndex of the document.
     Returns:
     dict: A dictionary containing the text and index ranges of found duplicates.
     """
     duplicate_info = {'text': [], 'index': []}
-    for i, para in enumerate(doc.paragraphs[start_index:], start=start_index):
-        text = para.text.strip().lower()
+    paragraph_count = len(paragraphs)
+
+    # Only the paragraphs holding a section boundary need to be looked at
+    boundaries = sorted(set(paragraphs.find_all(TITLE_OF_RULE, start_index) + paragraphs.find_all(DIVISION_CONTACT_PHONE, start_index)))
+    for i in boundaries:
+        text = paragraphs.lower_texts[i]
 
         # Mark the start of a potential duplicate section
-        if 'title of rule' in text:
+        if TITLE_OF_RULE in text:
             if duplicate_info['index']:
                 duplicate_info['index'].pop()
             duplicate_info['index'].append(i)
 
         # Check for the end of a potential duplicate section
-        if 'division / contact / phone:' in text:
+        if DIVISION_CONTACT_PHONE in text:
             temp_index = i
-            match_text = [p.text.strip().replace('\t', '') for p in doc.paragraphs[duplicate_info['index'][0]:temp_index]]
-            
+            match_text = paragraphs.clean_texts[duplicate_info['index'][0]:temp_index]
+
             # Check the next few paragraphs to ensure we capture the full duplicate section
-            for no, p in enumerate(doc.paragraphs[temp_index:temp_index+6], start=temp_index):
-                match_text.append(p.text.replace('\t', ''))
-                str_match_text = ''.join(match_text)
-                
-                # Use fuzzy matching to identify duplicates
-                if fuzz.ratio(search_text, str_match_text) > 95:
-                    duplicate_info['index'].append(no)
-                    break
+            window_texts = [paragraphs.texts[no].replace('\t', '') for no in range(temp_index, min(temp_index + 6, paragraph_count))]
+
+            # Use fuzzy matching to identify duplicates
+            window = find_duplicate_window(search_text, match_text, window_texts)
+            if window is not None:
+                duplicate_info['index'].append(temp_index + window)
 
             if len(duplicate_info['index']) > 1:
                 break
-            if i == len(doc.paragraphs) - 1:
+            if i == paragraph_count - 1:
                 return duplicate_info
             
     # If a duplicate is found, extract its text
     if len(duplicate_info['index']) > 1:
         start = duplicate_info['index'][0]
         end = duplicate_info['index'][1] + 1
-        text = ''.join([doc.paragraphs[row_no].text.strip().replace('\t', '') for row_no in range(start, end)])
+        text = ''.join(paragraphs.clean_texts[start:end])
         duplicate_info['text'].append(text)
     return duplicate_info
 
 
 
-def remove_paragraphs(doc, indexes):
+def remove_paragraphs(paragraphs, indexes):
     """
     Remove paragraphs from the document based on the provided indexes.
+    The ranges are deleted through the ParagraphIndex in one pass over the document.
     """
     # Sort indexes in reverse order to avoid shifting issues when removing paragraphs
     sorted_indexes = sorted(indexes, key=lambda x: x[0], reverse=True)
     for index in sorted_indexes:
         print(index)
-        if len(index) > 1:
-            for i in range(index[1], index[0]-1, -1):
-                p = doc.paragraphs[i]._element
-                p.getparent().remove(p)
-                p._element = p._p = None
+    paragraphs.delete_ranges([(index[0], index[1]) for index in sorted_indexes if len(index) > 1])
     
 
 
@@ -149,9 +194,19 @@ def remove_duplicate_paragraphs(docx_path, doc_type):
     Remove duplicate paragraphs from the document.
     """
     doc = Document(docx_path)
+    remove_duplicate_paragraphs_in_document(doc, doc_type)
+    doc.save(docx_path)
+
+
+def remove_duplicate_paragraphs_in_document(doc, doc_type, paragraphs=None):
+    """
+    Remove duplicate paragraphs from the loaded document.
+    paragraphs is an up to date ParagraphIndex of the document, built here when not given.
+    """
+    paragraphs = paragraphs or ParagraphIndex(doc)
 
     # Find potential duplicate sections
-    master_dict_text_index = find_duplicate_sections(doc, doc_type)
+    master_dict_text_index = find_duplicate_sections(paragraphs, doc_type)
     print(f'master_dict_text_index {master_dict_text_index}')
 
     del_dup_index_list = []
@@ -160,7 +215,7 @@ def remove_duplicate_paragraphs(docx_path, doc_type):
     for index, (start, end) in enumerate(master_dict_text_index['index']):
         current_start = end + 1
         while True:
-            duplicate_info_dic = find_duplicate_text(doc, start_index=current_start, search_text=master_dict_text_index['text'][index])
+            duplicate_info_dic = find_duplicate_text(paragraphs, start_index=current_start, search_text=master_dict_text_index['text'][index])
             if len(duplicate_info_dic['index']) > 1:
                 del_dup_index_list.append(duplicate_info_dic['index'])
                 current_start = duplicate_info_dic['index'][-1] + 1
@@ -168,8 +223,8 @@ def remove_duplicate_paragraphs(docx_path, doc_type):
                 break
     
     # Remove the identified duplicate paragraphs
-    remove_paragraphs(doc, del_dup_index_list)
-    doc.save(docx_path)
+    remove_paragraphs(paragraphs, del_dup_index_list)
+    return bool(del_dup_index_list)
 
 
 
@@ -182,52 +237,47 @@ def check_text_present(values:list,text:str):
 def determine_aft_file_type(input_docx_path,source_file_path):
     """
     Determine the type of AFT file and process it accordingly.
+    The type comes from a pre-scan of the file, which is only loaded when its variant edits the document.
+    """
+    variant = prescan_variant(input_docx_path, 'aft')
+    if variant is None or not variant.needs_dom:
+        logging.info('no document edits for this varient')
+        return
+    doc = Document(input_docx_path)
+    if apply_aft_rules(doc, variant):
+        doc.save(input_docx_path)
+
+
+def apply_aft_rules(doc, variant=None):
+    """
+    Determine the type of the loaded AFT document and remove its duplicate sections.
+    variant is the result of an earlier pre-scan, classified from the document when not given.
+    Returns False when the document was left unchanged.
     """
 
     #Varient 2!
     #dealing with title of rule and rule number varients
-    doc = Document(input_docx_path)
+    if variant is not None and not variant.needs_dom:
+        logging.info(f'type assigned : {variant.name}, no document edits for this varient')
+        return False
 
     # This flow is for the files that has no logo and has title and rule number files
-    doc_type = ''
-    index_of_title = 0
-    
-    # Find the index of "Title of Rule"
-    for cntr, para in enumerate(doc.paragraphs):
-        if 'title of rule:' in para.text.strip().lower():
-            index_of_title = cntr
-            break
-    
-    # Check the next few paragraphs for key phrases
-    text_check = []
-    for par in doc.paragraphs[index_of_title:index_of_title+10]:
-        text_check.append(par.text)
-
-    del doc   #discarding memory data    
-    check_text_val = " ".join(text_check).strip().lower()
-
-    title_and_rule_number = 'title of rule:' in check_text_val and 'rule number:' in check_text_val
-
-    # Determine the document type based on key phrases
-    if title_and_rule_number and 'division / contact / phone:' in check_text_val and 'secretary of state' in check_text_val:
-        doc_type = 'TYPE 1'
-    elif title_and_rule_number and 'division / contact / phone:' in check_text_val and 'statement of basis and purpose' in check_text_val:
-        doc_type = 'TYPE 2'
-    elif title_and_rule_number and 'Compliance and Innovation Division (CID) / Matt Bohanan /'.strip().lower() in check_text_val and 'statement of basis and purpose' in check_text_val:
-        doc_type = 'TYPE 3'
-    elif title_and_rule_number and 'OCL / Tiffani Domokos and Cassandra Keller'.strip().lower() in check_text_val and 'statement of basis and purpose' in check_text_val:
-        doc_type = 'TYPE 4'
-    elif 'Add any new varients here':
-            pass
+    paragraphs = ParagraphIndex(doc)
+
+    # Determine the document type from the paragraphs after "Title of Rule";
+    # new varients are added to the registry in variant_classifier
+    variant = variant or classify_texts(paragraphs.texts, 'aft')
+    doc_type = variant.name if variant else ''
     
     logging.info(f'type assigned : {doc_type}')
     match doc_type:
         case 'TYPE 1' | 'TYPE 2':
-            remove_duplicate_paragraphs(input_docx_path, doc_type)
+            return remove_duplicate_paragraphs_in_document(doc, doc_type, paragraphs)
         case 'TYPE 3':
             pass
         case _:
             logging.info('no matching varient')
+    return False
 
     
 
@@ -2,8 +2,11 @@ from docx import Document
 from docx.oxml.ns import qn
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.shared import Pt, Cm
-from fuzzywuzzy import fuzz
 import logging
+from core_components.jurisdictions.co import co_aft
+from core_components.jurisdictions.co.paragraph_index import ParagraphIndex
+from core_components.jurisdictions.co.anchor_scanner import TITLE_OF_RULE, SECRETARY_OF_STATE
+from core_components.jurisdictions.co.variant_classifier import classify_texts, prescan_variant
 
 
 
@@ -59,163 +62,39 @@ def add_text(doc, first_header_text=''):
 
 
 
-def find_duplicate_sections(doc, doc_type):
-    """
-    Find potential duplicate sections in the document based on the document type.
-    Returns:
-    dict: A dictionary containing the text and index ranges of potential duplicate sections.
-    """
-    duplicate_info = {'text': [], 'index': []}
-    end_of_text_state_basis_index = []
-
-    # Determine the end text lookup based on document type
-    end_text_lookup = 'secretary of state' if doc_type == 'TYPE 1' else 'statement of basis and purpose'
-    
-    # Find all occurrences of the end text
-    for i, para in enumerate(doc.paragraphs):
-        text = para.text.strip().lower()
-        if end_text_lookup in text:
-            end_of_text_state_basis_index.append(i)
-    
-    # For each end text occurrence, find the corresponding start ("title of rule")
-    for n in end_of_text_state_basis_index:
-        for i in range(n-1, -1, -1):
-            text = doc.paragraphs[i].text.strip().lower()
-            if 'title of rule' in text:
-                duplicate_info['index'].append([i, n-1])
-                break
-
-        # Extract the text between start and end
-        search_text = " ".join([p.text.strip().replace('\t', '') for p in doc.paragraphs[i:n]]).strip()
-        duplicate_info['text'].append(search_text)
-    return duplicate_info
-
-
-
-def find_duplicate_text(doc, start_index, search_text):
-    """
-    Find duplicate text in the document starting from a given index.
-    Returns:
-    dict: A dictionary containing the text and index ranges of found duplicates.
-    """
-    duplicate_info = {'text': [], 'index': []}
-    for i, para in enumerate(doc.paragraphs[start_index:], start=start_index):
-        text = para.text.strip().lower()
-
-        # Mark the start of a potential duplicate section
-        if 'title of rule' in text:
-            if duplicate_info['index']:
-                duplicate_info['index'].pop()
-            duplicate_info['index'].append(i)
-
-        # Check for the end of a potential duplicate section
-        if 'division / contact / phone:' in text:
-            temp_index = i
-            match_text = [p.text.strip().replace('\t', '') for p in doc.paragraphs[duplicate_info['index'][0]:temp_index]]
-            
-            # Check the next few paragraphs to ensure we capture the full duplicate section
-            for no, p in enumerate(doc.paragraphs[temp_index:temp_index+6], start=temp_index):
-                match_text.append(p.text.replace('\t', ''))
-                str_match_text = ''.join(match_text)
-                
-                # Use fuzzy matching to identify duplicates
-                if fuzz.ratio(search_text, str_match_text) > 95:
-                    duplicate_info['index'].append(no)
-                    break
-
-            if len(duplicate_info['index']) > 1:
-                break
-            if i == len(doc.paragraphs) - 1:
-                return duplicate_info
-            
-    # If a duplicate is found, extract its text
-    if len(duplicate_info['index']) > 1:
-        start = duplicate_info['index'][0]
-        end = duplicate_info['index'][1] + 1
-        text = ''.join([doc.paragraphs[row_no].text.strip().replace('\t', '') for row_no in range(start, end)])
-        duplicate_info['text'].append(text)
-    return duplicate_info
-
-
-
-def remove_paragraphs(doc, indexes):
-    """
-    Remove paragraphs from the document based on the provided indexes.
-    """
-    # Sort indexes in reverse order to avoid shifting issues when removing paragraphs
-    sorted_indexes = sorted(indexes, key=lambda x: x[0], reverse=True)
-    for index in sorted_indexes:
-        print(index)
-        if len(index) > 1:
-            for i in range(index[1], index[0]-1, -1):
-                p = doc.paragraphs[i]._element
-                p.getparent().remove(p)
-                p._element = p._p = None
-
-
-
-def remove_duplicate_paragraphs(doc, doc_type):
+def remove_duplicate_paragraphs(paragraphs, doc_type):
     """
     Remove duplicate paragraphs from the document.
+    Uses the duplicate search of co_aft on the ParagraphIndex of the document.
     """
-    #doc = Document(docx_path)
-
-    # Find potential duplicate sections
-    master_dict_text_index = find_duplicate_sections(doc, doc_type)
-    print(f'master_dict_text_index {master_dict_text_index}')
-
-    del_dup_index_list = []
-
-    # For each potential duplicate section, search for actual duplicates
-    for index, (start, end) in enumerate(master_dict_text_index['index']):
-        current_start = end + 1
-        while True:
-            duplicate_info_dic = find_duplicate_text(doc, start_index=current_start, search_text=master_dict_text_index['text'][index])
-            if len(duplicate_info_dic['index']) > 1:
-                del_dup_index_list.append(duplicate_info_dic['index'])
-                current_start = duplicate_info_dic['index'][-1] + 1
-            else:
-                break
-    
-    # Remove the identified duplicate paragraphs
-    remove_paragraphs(doc, del_dup_index_list)
-    #doc.save(docx_path.replace('.docx', '_1.docx'))
+    co_aft.remove_duplicate_paragraphs_in_document(paragraphs.doc, doc_type, paragraphs)
 
 
 
 
 
-def new_get_pattern_index_of_text(start_index,doc):
+def new_get_pattern_index_of_text(start_index,paragraphs):
         duplicate_info = {'text': [], 'index': []}
-        secretary_of_state_index = []
-        
-        for i, para in enumerate(doc.paragraphs[start_index:], start=start_index):
-            text = para.text.strip().lower()    
-            
-            if 'secretary of state' in text:
-                secretary_of_state_index.append(i)
+        secretary_of_state_index = paragraphs.find_all(SECRETARY_OF_STATE, start_index)
         
         for n in secretary_of_state_index:
-            for i in range(n-1, -1, -1):
-                text = doc.paragraphs[i].text.strip().lower()
-                
-                if 'title of rule' in text:
-                    duplicate_info['index'].append([i, n-1])
-                    break
-
-            search_text = " ".join([p.text.strip().replace('\t', '') for p in doc.paragraphs[i:n]]).strip()
+            start = paragraphs.find_previous(TITLE_OF_RULE, n)
+            if start is not None:
+                duplicate_info['index'].append([start, n-1])
+
+            search_text = " ".join(paragraphs.clean_texts[start or 0:n]).strip()
             duplicate_info['text'].append(search_text)
 
         return duplicate_info
 
 
-def add_text_before_index(doc, para_indexes, text_to_insert):
+def add_text_before_index(paragraphs, para_indexes, text_to_insert):
     # Sort the indices in reverse order
     insert_positions = sorted([index[0] for index in para_indexes['index']], reverse=True)
     
     for i, position in enumerate(insert_positions):
         # Create a new paragraph before the current position
-        new_paragraph = doc.paragraphs[position].insert_paragraph_before(text_to_insert)
+        new_paragraph = paragraphs.insert_paragraph_before(position, text_to_insert)
         
         # Style the new paragraph
         run = new_paragraph.runs[0]  # Access the first run in the paragraph
@@ -227,20 +106,31 @@ def add_text_before_index(doc, para_indexes, text_to_insert):
 
         # Add REDLINE at the beginning of the last entry
         if i == len(insert_positions) - 1:
-            redline_run = new_paragraph.insert_paragraph_before().add_run('REDLINE')
+            redline_run = paragraphs.insert_paragraph_before(position, 'REDLINE').runs[0]
             redline_font = redline_run.font
             redline_font.name = 'Times New Roman'
             redline_font.size = Pt(12)
             redline_font.bold = True
             
 
-    return doc
+    return paragraphs.doc
 
 
 
 def main(input_docx):
-    print("entered redline text")
+    # The pre-scan tells whether the document needs to be loaded at all
+    variant = prescan_variant(input_docx, 'redline')
+    if variant is None or not variant.needs_dom:
+        print(f'Type assigned {variant.name if variant else ""}')
+        return
     doc = Document(input_docx)
+    apply_redline_rules(doc, variant)
+    doc.save(input_docx)
+
+
+def apply_redline_rules(doc, variant=None):
+    """Apply the redline rules to the loaded document; variant is the result of an earlier pre-scan, if any"""
+    print("entered redline text")
 
     # Get the first header text
     # first_header_text = get_first_header_text(doc)
@@ -252,49 +142,29 @@ def main(input_docx):
 
     
     #*****The below functionality is for the title of rule and there vairants*****
-    doc_type = ''
-    index_of_title = 0
-    
-    # Find the index of "Title of Rule"
-    for cntr, para in enumerate(doc.paragraphs):
-        if 'title of rule:' in para.text.strip().lower():
-            index_of_title = cntr
-            break
-
-    # Check the next few paragraphs for key phrases
-    text_check = []
-    for par in doc.paragraphs[index_of_title:index_of_title+10]:
-        text_check.append(par.text)
-
-    check_text_val = " ".join(text_check).strip().lower()
+    paragraphs = ParagraphIndex(doc)
 
-    title_and_rule_number = 'title of rule:' in check_text_val and 'rule number:' in check_text_val
-
-
-    # Determine the document type based on key phrases
-    if title_and_rule_number and 'division / contact / phone:' in check_text_val and 'secretary of state' in check_text_val:
-        doc_type = 'TYPE 1'
-    elif title_and_rule_number and 'division / contact / phone:' in check_text_val and 'statement of basis and purpose' in check_text_val:
-        doc_type = 'TYPE 2'
+    # Determine the document type from the paragraphs after "Title of Rule"
+    variant = variant or classify_texts(paragraphs.texts, 'redline')
+    doc_type = variant.name if variant else ''
     
     print(f'Type assigned {doc_type}')
     match doc_type:
         case 'TYPE 1' | 'TYPE 2':
-            remove_duplicate_paragraphs(doc, doc_type)
+            remove_duplicate_paragraphs(paragraphs, doc_type)
         case 'TYPE 3':
             pass
     print("came till here")
                        
 
-    dict_with_indexes = new_get_pattern_index_of_text(0, doc)
+    dict_with_indexes = new_get_pattern_index_of_text(0, paragraphs)
 
     # if dict_with_indexes['index'] and :
-    #         doc = add_text_before_index(doc, dict_with_indexes, first_header_text)
+    #         doc = add_text_before_index(paragraphs, dict_with_indexes, first_header_text)
     # else:
     #     print("add text call")
     #     add_text(doc,'')
-
-    doc.save(input_docx)
+    return doc_type in ('TYPE 1', 'TYPE 2')
 
 
 
@@ -1,16 +1,28 @@
 from docx import Document
 from docx.oxml.ns import qn
-import pytesseract
 from PIL import Image, ImageFilter
 import io, os
 from docx.oxml import OxmlElement
 import re
+from collections import deque
+from itertools import islice
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, Future
 from core_components.jurisdictions.co import co_redline
 from core_components.jurisdictions.co import co_aft
+from core_components.jurisdictions.co.variant_classifier import prescan_variant
 import logging
+from common_func.document_pass_manager import DocumentPassManager
+from common_func import ocr_cache
+from common_func.logo_index import load_logo_index, is_decorative_image
+from common_func.image_preprocessing import DEFAULT_OCR_OPTIONS, preprocess_for_ocr, ocr_settings_key
+from converter_modules.ocr_integration.ocr_engine import get_ocr_backend
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(filename)s - %(message)s')
 
+# Images OCR'd at the same time, each on its own tesseract engine (or process, with pytesseract)
+OCR_WORKERS = min(4, os.cpu_count() or 1)
+
 # def replace_bullets_with_text(input_docx_path):
 #     "This function is used to check bullets in the docx file and replace them with value "
 #     doc = Document(input_docx_path)
@@ -54,6 +66,14 @@ def remove_pagechars(input_docx_path):
 
 def convert_hyperlink_to_text(input_docx_path):
     doc = Document(input_docx_path)
+    convert_hyperlinks_in_document(doc)
+    doc.save(input_docx_path)
+    logging.info(f"Removed hyperlinks and saved as {input_docx_path}")
+
+
+def convert_hyperlinks_in_document(doc):
+    """Replace external hyperlinks in the loaded document with plain Times New Roman runs."""
+    converted = False
     for paragraph in doc.paragraphs:
         p = paragraph._p
         hyperlinks = p.xpath(".//w:hyperlink")
@@ -95,10 +115,9 @@ def convert_hyperlink_to_text(input_docx_path):
             
             # Remove the hyperlink
             p.remove(hyperlink)
+            converted = True
             logging.info("Hyperlink converted to text.")
-    
-    doc.save(input_docx_path)
-    logging.info(f"Removed hyperlinks and saved as {input_docx_path}")
+    return converted
 
 
 def convert_hyperlink_to_text_old(input_docx_path):
@@ -173,49 +192,162 @@ def convert_hyperlink_to_text_old(input_docx_path):
 
 
 def extract_images_with_locations(input_docx_path,header_check=False):
+    doc = Document(input_docx_path)
+    return find_images_with_locations(doc, header_check)
+
+
+def find_images_with_locations(doc, header_check=False):
+    """Return (index, paragraph location, image blob) for every image in the loaded document"""
+    return list(iter_image_blobs(doc, find_image_locations(doc, header_check)))
+
+
+def find_image_locations(doc, header_check=False):
+    """Return (index, paragraph location, relationship id) for every image in the loaded document, without reading the images"""
     logging.info(f"header check : {header_check}")
  
-    doc = Document(input_docx_path)
-    images_with_locations = []
+    image_locations = []
     index = 0
     logging.info('read document')
     doc_part_to_consider = doc.paragraphs[:11] if header_check else doc.paragraphs  #depending on weather you want to check header or all the values use this
      
 
     for i, paragraph in enumerate(doc_part_to_consider):
-        for element in paragraph._element.iter():
-            if element.tag == qn('w:drawing'):
-                blip = element.find('.//a:blip', namespaces={'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'})
-                if blip is not None:
-                    img_id = blip.get(qn('r:embed'))
-                    image_part = doc.part.related_parts[img_id]
-                    images_with_locations.append((index, i, image_part.blob))
-                    index += 1
+        for element in paragraph._element.iter(qn('w:drawing')):
+            blip = element.find('.//a:blip', namespaces={'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'})
+            if blip is not None:
+                img_id = blip.get(qn('r:embed'))
+                image_locations.append((index, i, img_id))
+                index += 1
+
+    logging.info(f'number of images identified {len(image_locations)}')
+    return image_locations
+
+
+def iter_image_blobs(doc, image_locations):
+    """Yield (index, paragraph location, image blob), reading each image from the package only when it is reached"""
+    for index, location, img_id in image_locations:
+        yield index, location, doc.part.related_parts[img_id].blob
+
+
+
+def ocr_image_blob(img_blob, ocr_options=None):
+    image = Image.open(io.BytesIO(img_blob))
+    if ocr_options and ocr_options.get('preprocess'):
+        image = preprocess_for_ocr(image, **ocr_options)
+    return get_ocr_backend(get_ocr_engine(ocr_options)).image_to_string(image)
+
+
+def get_ocr_engine(ocr_options=None):
+    return (ocr_options or DEFAULT_OCR_OPTIONS).get('engine') or 'auto'
+
+
+@lru_cache(maxsize=None)
+def get_engine_version(engine):
+    try:
+        return get_ocr_backend(engine).version()
+    except Exception as e:
+        logging.warning(f'Unable to read the tesseract version: {e}')
+        return 'unknown'
+
+
+def get_ocr_settings(ocr_options=None):
+    """Everything besides the image that decides the OCR text of ocr_image_blob, used in the OCR cache key"""
+    engine = get_ocr_engine(ocr_options)
+    return (get_ocr_backend(engine).name, get_engine_version(engine), 'image_to_string', 'lang=eng', 'config=') + ocr_settings_key(ocr_options)
+
+
+def is_colorado_logo_text(text):
+    return 'colorado' in text.strip().lower()
 
-    logging.info(f'number of images identified {len(images_with_locations)}')
-    return images_with_locations
 
+def completed_future(text):
+    future = Future()
+    future.set_result(text)
+    return future
 
 
-def extract_text_from_images(images_with_locations):
-    """extract images and there location from docx """
+def extract_text_from_images(images_with_locations, stop_when=None, max_workers=OCR_WORKERS, cache=None,
+                             logo_index=None, ocr_options=None):
+    """
+    extract images and there location from docx
+    The images are OCR'd on a bounded thread pool and the texts returned in image order.
+    With stop_when (e.g. is_colorado_logo_text), OCR stops after the first image whose text it accepts.
+    With an OcrCache, images OCR'd before (like the state logo) are read from the cache, and images
+    repeated in the document are OCR'd once.
+    Images too small or too uniform to hold text are not OCR'd. With a LogoIndex, an image that is a copy
+    of a curated logo takes its header text without OCR.
+    ocr_options (see image_preprocessing.DEFAULT_OCR_OPTIONS) choose how images are prepared for OCR.
+    """
+    ocr_options = DEFAULT_OCR_OPTIONS if ocr_options is None else ocr_options
     texts = []
-    for idx, location, img_blob in images_with_locations:
-        image = Image.open(io.BytesIO(img_blob))
-        text = pytesseract.image_to_string(image=image)
-        print(f'text extracted is : {text}')
-        if text.strip():                       #filtering and adding only non empty image locations
-            texts.append((idx, location, text))
-            logging.info(f'added location text {location}')
+    images = iter(images_with_locations)
+    pending = deque()
+    in_flight = {}
+    settings = get_ocr_settings(ocr_options) if cache else ()
+
+    def record(name):
+        if cache:
+            cache.increment(name)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def start(img_blob, key):
+            """Return (future of the text, whether to cache it)"""
+            cached_text = cache.get(key) if cache else None
+            if cached_text is not None:
+                return completed_future(cached_text), False
+
+            image = Image.open(io.BytesIO(img_blob))
+            if is_decorative_image(image):
+                record('skipped_images')
+                return completed_future(''), False
+            logo_text = logo_index.lookup(image) if logo_index is not None else None
+            if logo_text is not None:
+                record('logo_hits')
+                return completed_future(logo_text), False
+            return executor.submit(ocr_image_blob, img_blob, ocr_options), cache is not None
+
+        def submit(count):
+            for idx, location, img_blob in islice(images, count):
+                key = ocr_cache.compute_image_key(img_blob, settings) if cache else None
+                if key in in_flight:
+                    future, store = in_flight[key], False
+                else:
+                    future, store = start(img_blob, key)
+                    if key:
+                        in_flight[key] = future
+                pending.append((idx, location, key, future, store))
+
+        # Keep a few images queued ahead of the one being collected
+        submit(2 * max_workers)
+        while pending:
+            idx, location, key, future, store = pending.popleft()
+            text = future.result()
+            if store:
+                cache.put(key, text)
+            submit(1)
+            print(f'text extracted is : {text}')
+            if text.strip():                       #filtering and adding only non empty image locations
+                texts.append((idx, location, text))
+                logging.info(f'added location text {location}')
+            if stop_when is not None and stop_when(text):
+                for _, _, _, queued, _ in pending:
+                    queued.cancel()
+                break
     return texts
 
 
 def insert_single_text_in_paragraph(input_docx_path, location, text):
     """This function adds logo text present at the top of page along with 
     file type for ADDITIONAL INFORMATION/ EMERGENCY JUSTIFICATION/ BASIS AND PURPOSE files"""
-    
-    base_name, file_extension = os.path.splitext(input_docx_path)
     doc = Document(input_docx_path)
+    insert_single_text(doc, input_docx_path, location, text)
+    doc.save(input_docx_path)
+    logging.info(f"Modified document saved as {input_docx_path}")
+
+
+def insert_single_text(doc, input_docx_path, location, text):
+    """Replace the logo paragraph at location with its text in the loaded document, see insert_single_text_in_paragraph"""
+    base_name, file_extension = os.path.splitext(input_docx_path)
                                  #only one logo present in docx file
     paragraph = doc.paragraphs[location]
     paragraph.clear()
@@ -233,22 +365,27 @@ def insert_single_text_in_paragraph(input_docx_path, location, text):
         else:
             paragraph.add_run(text.strip().replace('\n\n','\n')).bold = True
 
-    doc.save(input_docx_path)
-    logging.info(f"Modified document saved as {input_docx_path}")
-
 
 
 
 def insert_multiple_text_in_paragraph(input_docx_path,img_location_list):
     """Function to add multiple text based on the list index position provided"""
     doc = Document(input_docx_path)
-    
+    insert_multiple_text(doc, input_docx_path, img_location_list)
+    # Save the modified document
+    doc.save(input_docx_path)      
+
+
+def insert_multiple_text(doc, input_docx_path, img_location_list):
+    """Replace every Colorado logo in the loaded document with its text, see insert_multiple_text_in_paragraph"""
     sorted_list = sorted(img_location_list,key=lambda x: x[1],reverse=True)
     logging.info(f'sorted list {sorted_list}')
 
+    # Runs are replaced in place, so one snapshot of the paragraphs serves every location
+    paragraphs = doc.paragraphs
     for index,location,content in sorted_list:
         if "colorado" in content.lower():
-            paragraph = doc.paragraphs[location]
+            paragraph = paragraphs[location]
 
             # Remove all runs (including images) from the paragraph
             for run in paragraph.runs:
@@ -270,46 +407,87 @@ def insert_multiple_text_in_paragraph(input_docx_path,img_location_list):
         elif 'basisandpurpose' in base_name.strip().lower():
             paragraph.add_run('BASIS AND PURPOSE').bold = True
 
-    
-    # Save the modified document
-    doc.save(input_docx_path)      
-
 
 def add_first_line_header(input_docx_path):
+    doc = Document(input_docx_path)   
+    if add_first_line_header_text(doc, input_docx_path):
+        doc.save(input_docx_path)
+        logging.info(f"Added first line info when images count is zero ,document saved as {input_docx_path}")
+
+
+def add_first_line_header_text(doc, input_docx_path):
+    """Insert the file type header above the first paragraph; returns False when the header is already present"""
     base_name, file_extension = os.path.splitext(input_docx_path)
 
-    doc = Document(input_docx_path)   
-    
+    if 'addinfo' in base_name.strip().lower():
+        if any(par.text == 'ADDITIONAL INFORMATION' for par in doc.paragraphs[:2]):
+            return False
+
     paragraph = doc.paragraphs[0].insert_paragraph_before()
 
     if 'addinfo' in base_name.strip().lower():
-        if doc.paragraphs[0].text =='ADDITIONAL INFORMATION' or doc.paragraphs[1].text == 'ADDITIONAL INFORMATION' or doc.paragraphs[2].text == 'ADDITIONAL INFORMATION':
-            return
         paragraph.add_run('ADDITIONAL INFORMATION').bold = True
     elif 'emergency' in base_name.strip().lower():
         paragraph.add_run('EMERGENCY JUSTIFICATION').bold = True    
     elif 'basisandpurpose' in base_name.strip().lower():
         paragraph.add_run('BASIS AND PURPOSE').bold = True         
-    doc.save(input_docx_path)
-    logging.info(f"Added first line info when images count is zero ,document saved as {input_docx_path}")
+    return True
 
 
 
 def main_co_files(input_docx_path,source_file_path):
     """Main function for co region, this function assigns and calls functions based """
+    passes = DocumentPassManager(input_docx_path)
+    register_co_passes(passes, input_docx_path, source_file_path)
+    passes.run()
+
+
+def co_document_kind(input_docx_path):
+    """'aft' or 'redline' when the file name selects the rules of that kind, else None"""
+    base_name = os.path.splitext(input_docx_path)[0].strip().lower()
+    if 'aft' in base_name:
+        return 'aft'
+    if 'redline' in base_name:
+        return 'redline'
+    return None
+
+
+def register_co_passes(passes, input_docx_path, source_file_path, ocr_cache_context=None, ocr_options=None):
+    """
+    Register the co region rules on a DocumentPassManager so they share one loaded document.
+    AFT and redline files are classified here by a streaming pre-scan, before the document is loaded;
+    apply_co_rules classifies the loaded document instead when it inserts logo text.
+    """
+    kind = co_document_kind(input_docx_path)
+    variant = prescan_variant(input_docx_path, kind) if kind else None
+    passes.register('co_rules', apply_co_rules, input_docx_path, source_file_path, ocr_cache_context, ocr_options, variant)
+    # Issue Cause is this function which is not working properly for linked footers
+    passes.register('co_hyperlinks', convert_hyperlinks_in_document)
+
+
+def apply_co_rules(doc, input_docx_path, source_file_path, ocr_cache_context=None, ocr_options=None, variant=None):
+    """
+    Apply the co region rules to the loaded document, choosing them from the file name.
+    variant is the pre-scanned variant of an AFT or redline file. It is classified from the document when None,
+    or when logo text was inserted after the pre-scan.
+    """
     
     logging.info(f"Starting main_co_files function with input: {input_docx_path}")
     text_inserted = False
+    header_inserted = False
     #get basename of docx
     base_name, file_extension = os.path.splitext(input_docx_path)
 
     #logic to check initial header/logo present and add text at that location
-    images_with_locations = extract_images_with_locations(input_docx_path,header_check=False)
+    images_with_locations = find_image_locations(doc,header_check=False)
     
     logging.info(f"Number of images extracted: {len(images_with_locations)}")
 
     if len(images_with_locations) > 0:  # File contains headers
-        img_texts = extract_text_from_images(images_with_locations)
+        cache = ocr_cache.open_ocr_cache(ocr_cache_context)
+        logo_index = load_logo_index((ocr_options or DEFAULT_OCR_OPTIONS).get('logo_dir'))
+        img_texts = extract_text_from_images(iter_image_blobs(doc, images_with_locations), cache=cache, logo_index=logo_index,
+                                             ocr_options=ocr_options)
         texts = [text for text in img_texts  if text[2]]
         logging.debug(f"Extracted texts: {texts}")
 
@@ -318,33 +496,40 @@ def main_co_files(input_docx_path,source_file_path):
             if len(images_with_locations) > 1 and len(texts) > 1:
                 # This is for files which has logo to begin with
                 logging.info("calling multiple text insert")
-                if any('colorado' in text[2].strip().lower() for text in texts):
-                    insert_multiple_text_in_paragraph(input_docx_path=input_docx_path,img_location_list=img_texts )
+                if any(is_colorado_logo_text(text[2]) for text in texts):
+                    insert_multiple_text(doc, input_docx_path, img_location_list=img_texts)
+                    header_inserted = True
             else:
                 logging.info("calling single text insert")
                 #need to check what basename is aft or kinda 
-                insert_single_text_in_paragraph(input_docx_path=input_docx_path,location=texts[0][1],text=texts[0][2])                
+                insert_single_text(doc, input_docx_path, location=texts[0][1], text=texts[0][2])
                 text_inserted = True
+                header_inserted = True
+
+    if header_inserted and variant is not None:
+        # The pre-scan read the file before the logo text went in, and that text (such as
+        # 'Secretary of State') can hold key phrases of a variant, so classify the document again
+        logging.info("logo text inserted, classifying the document again")
+        variant = None
 
     #check file type and perform action
     if 'aft' in base_name.strip().lower():
         #chek pdf present as source and if keywords present
-        co_aft.determine_aft_file_type(input_docx_path=input_docx_path,source_file_path=source_file_path)
+        co_aft.apply_aft_rules(doc, variant)
 
     elif 'redline' in base_name.strip().lower():
         #calling redline code
-        co_redline.main(input_docx_path) 
+        co_redline.apply_redline_rules(doc, variant)
 
     elif 'addinfo' in base_name.strip().lower():   #Added extra check for addinfo as no data was getting added (added on 2025-01-16)
         if not text_inserted:
             # add_first_line_header(input_docx_path)
             if len(images_with_locations) > 0 and len(texts) > 0:
-                insert_single_text_in_paragraph(input_docx_path=input_docx_path,location=0,text=texts[0][2])
+                insert_single_text(doc, input_docx_path, location=0, text=texts[0][2])
 
     if len(images_with_locations) <= 0:
-        add_first_line_header(input_docx_path=input_docx_path)
+        add_first_line_header_text(doc, input_docx_path)
 
     # # run common guideline logics
     # replace_bullets_with_text(input_docx_path)
-    convert_hyperlink_to_text(input_docx_path)     # Issue Cause is this function which is not working properly for linked footers
-    # remove_tabs_from_document(input_docx_path)
\ No newline at end of file
+    # remove_tabs_from_document(input_docx_path)
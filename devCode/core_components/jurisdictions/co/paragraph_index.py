@@ -0,0 +1,104 @@
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from bisect import bisect_left
+from core_components.jurisdictions.co.anchor_scanner import co_anchor_scanner, positions_from
+
+
+class ParagraphIndex:
+    """
+    Snapshot of the body paragraphs of a document (the same list as doc.paragraphs) with their texts
+    computed once. Scans read the precomputed texts by position instead of rebuilding doc.paragraphs;
+    deletions and insertions made through the index keep the elements and texts in step with the document.
+    Lookups of the CO anchor phrases read a table of their positions, built in one scan of the texts.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self._anchors = None
+        self.elements = []
+        self.texts = []
+        self.lower_texts = []
+        self.clean_texts = []
+        for p in doc.element.body.iterchildren(qn('w:p')):
+            self.insert_entry(len(self.elements), p)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def insert_entry(self, position, p):
+        text = p.text
+        self._anchors = None
+        self.elements.insert(position, p)
+        self.texts.insert(position, text)
+        # stripped and lower-cased, as used for the phrase lookups
+        self.lower_texts.insert(position, text.strip().lower())
+        # stripped with tabs removed, as used to build section texts
+        self.clean_texts.insert(position, text.strip().replace('\t', ''))
+
+    def paragraph(self, position):
+        """python-docx Paragraph for the paragraph at position."""
+        return Paragraph(self.elements[position], self.doc._body)
+
+    def anchor_positions(self, phrase):
+        """Ascending positions of the paragraphs containing an anchor phrase, or None for other phrases."""
+        if phrase not in co_anchor_scanner.keywords:
+            return None
+        if self._anchors is None:
+            self._anchors = co_anchor_scanner.build_table(self.lower_texts)
+        return self._anchors[phrase]
+
+    def find_first(self, phrase, start=0):
+        """Position of the first paragraph from start whose lower-cased text contains phrase, or None."""
+        anchors = self.anchor_positions(phrase)
+        if anchors is not None:
+            found = bisect_left(anchors, start)
+            return anchors[found] if found < len(anchors) else None
+        for position in range(start, len(self.lower_texts)):
+            if phrase in self.lower_texts[position]:
+                return position
+        return None
+
+    def find_all(self, phrase, start=0):
+        """Positions of every paragraph from start whose lower-cased text contains phrase."""
+        anchors = self.anchor_positions(phrase)
+        if anchors is not None:
+            return positions_from(anchors, start)
+        return [position for position in range(start, len(self.lower_texts)) if phrase in self.lower_texts[position]]
+
+    def find_previous(self, phrase, before):
+        """Position of the last paragraph before the given position whose lower-cased text contains phrase, or None."""
+        anchors = self.anchor_positions(phrase)
+        if anchors is not None:
+            found = bisect_left(anchors, before)
+            return anchors[found - 1] if found else None
+        for position in range(before - 1, -1, -1):
+            if phrase in self.lower_texts[position]:
+                return position
+        return None
+
+    def delete_ranges(self, ranges):
+        """
+        Delete inclusive [start, end] paragraph ranges, one after another in the given order. Positions
+        refer to the paragraphs as they are after the earlier ranges were deleted, as with doc.paragraphs.
+        All elements are then removed from the document and the index rebuilt in a single pass.
+        """
+        remaining = list(range(len(self.elements)))
+        for start, end in ranges:
+            del remaining[start:end + 1]
+
+        kept = set(remaining)
+        for position, p in enumerate(self.elements):
+            if position not in kept:
+                p.getparent().remove(p)
+
+        self.elements = [self.elements[position] for position in remaining]
+        self.texts = [self.texts[position] for position in remaining]
+        self.lower_texts = [self.lower_texts[position] for position in remaining]
+        self.clean_texts = [self.clean_texts[position] for position in remaining]
+        self._anchors = None
+
+    def insert_paragraph_before(self, position, text=None):
+        """Insert a new paragraph before the one at position and return it as a python-docx Paragraph."""
+        paragraph = self.paragraph(position).insert_paragraph_before(text)
+        self.insert_entry(position, paragraph._p)
+        return paragraph
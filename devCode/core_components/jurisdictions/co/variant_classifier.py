@@ -0,0 +1,131 @@
+import zipfile
+import logging
+from lxml import etree
+from docx.oxml.ns import qn
+from docx.oxml.parser import element_class_lookup
+from core_components.jurisdictions.co.anchor_scanner import (
+    co_anchor_scanner, TITLE_OF_RULE_LABEL, RULE_NUMBER_LABEL, SECRETARY_OF_STATE, STATEMENT_OF_BASIS,
+    DIVISION_CONTACT_PHONE, CID_CONTACT, OCL_CONTACT
+)
+
+# Number of paragraphs from 'title of rule:' whose text decides the variant
+SIGNATURE_PARAGRAPHS = 10
+PRESCAN_CHUNK_SIZE = 64 * 1024
+
+W_BODY = qn('w:body')
+W_P = qn('w:p')
+
+
+class DocumentVariant:
+    """
+    A CO document variant, recognised when all of its key phrases occur in the signature text.
+    needs_dom tells whether the rules for the variant edit the document, so it has to be loaded.
+    """
+
+    def __init__(self, name, key_phrases, needs_dom=True):
+        self.name = name
+        self.key_phrases = frozenset(key_phrases)
+        self.needs_dom = needs_dom
+
+    def matches(self, found_phrases):
+        return self.key_phrases <= found_phrases
+
+    def __repr__(self):
+        return f'DocumentVariant({self.name!r})'
+
+
+# Variants per document kind, tried in order; add new variants with register_variant
+VARIANTS = {
+    'aft': [
+        DocumentVariant('TYPE 1', (TITLE_OF_RULE_LABEL, RULE_NUMBER_LABEL, DIVISION_CONTACT_PHONE, SECRETARY_OF_STATE)),
+        DocumentVariant('TYPE 2', (TITLE_OF_RULE_LABEL, RULE_NUMBER_LABEL, DIVISION_CONTACT_PHONE, STATEMENT_OF_BASIS)),
+        DocumentVariant('TYPE 3', (TITLE_OF_RULE_LABEL, RULE_NUMBER_LABEL, CID_CONTACT, STATEMENT_OF_BASIS), needs_dom=False),
+        DocumentVariant('TYPE 4', (TITLE_OF_RULE_LABEL, RULE_NUMBER_LABEL, OCL_CONTACT, STATEMENT_OF_BASIS), needs_dom=False),
+    ],
+    'redline': [
+        DocumentVariant('TYPE 1', (TITLE_OF_RULE_LABEL, RULE_NUMBER_LABEL, DIVISION_CONTACT_PHONE, SECRETARY_OF_STATE)),
+        DocumentVariant('TYPE 2', (TITLE_OF_RULE_LABEL, RULE_NUMBER_LABEL, DIVISION_CONTACT_PHONE, STATEMENT_OF_BASIS)),
+    ],
+}
+
+
+def register_variant(kind, variant):
+    """Add a variant for a document kind; it is tried after the variants registered before it."""
+    VARIANTS.setdefault(kind, []).append(variant)
+
+
+def classify_signature(texts, kind):
+    """Return the first variant of the kind matching the joined signature paragraph texts, or None."""
+    found_phrases = co_anchor_scanner.keywords_in(" ".join(texts).strip().lower())
+    for variant in VARIANTS[kind]:
+        if variant.matches(found_phrases):
+            return variant
+    return None
+
+
+def signature_texts(texts):
+    """The texts of the signature paragraphs: from the first 'title of rule:' paragraph, or the top of the document."""
+    for position, text in enumerate(texts):
+        if TITLE_OF_RULE_LABEL in text.lower():
+            return texts[position:position + SIGNATURE_PARAGRAPHS]
+    return texts[:SIGNATURE_PARAGRAPHS]
+
+
+def classify_texts(texts, kind):
+    """Classify a document from the texts of its body paragraphs."""
+    return classify_signature(signature_texts(texts), kind)
+
+
+def iter_body_paragraph_texts(docx_path):
+    """
+    Yield the text of each body paragraph of a DOCX file (as python-docx Paragraph.text gives it),
+    parsing word/document.xml incrementally and discarding every paragraph once it has been read.
+    """
+    parser = etree.XMLPullParser(events=('end',), tag=W_P, remove_blank_text=True, resolve_entities=False)
+    parser.set_element_class_lookup(element_class_lookup)
+    with zipfile.ZipFile(docx_path) as package, package.open('word/document.xml') as document_xml:
+        while True:
+            chunk = document_xml.read(PRESCAN_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            for _, p in parser.read_events():
+                body = p.getparent()
+                if body is None or body.tag != W_BODY:
+                    continue
+                yield p.text
+                # Drop the paragraph and everything before it, keeping memory flat on long documents
+                p.clear()
+                while p.getprevious() is not None:
+                    del body[0]
+        parser.close()
+
+
+def prescan_variant(docx_path, kind):
+    """
+    Classify a DOCX file from a streaming scan of its body text, without loading it into python-docx.
+    Reading stops once the signature paragraphs have been seen, or earlier as soon as the first
+    registered variant, which no other variant can take precedence over, matches.
+    """
+    leading_texts = []
+    signature = None
+    for text in iter_body_paragraph_texts(docx_path):
+        if signature is None:
+            if TITLE_OF_RULE_LABEL in text.lower():
+                signature = [text]
+            elif len(leading_texts) < SIGNATURE_PARAGRAPHS:
+                leading_texts.append(text)
+                continue
+            else:
+                continue
+        else:
+            signature.append(text)
+
+        if len(signature) == SIGNATURE_PARAGRAPHS:
+            break
+        if classify_signature(signature, kind) is VARIANTS[kind][0]:
+            break
+
+    variant = classify_signature(leading_texts if signature is None else signature, kind)
+    logging.info(f'pre-scan of {docx_path} assigned variant {variant.name if variant else None}')
+    return variant
@@ -1,24 +1,67 @@
 import zipfile
 import os
-import glob
 import shutil
 import time
 import gc
+import tempfile
 import tkinter as tk
 from tkinter import messagebox
 from datetime import datetime
+from typing import NamedTuple
+from multiprocessing import util as multiprocessing_util
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from logs.logs_handler import get_logger
 
 # Local imports
 import core_components.jurisdictions.ca as HTMLtoWord
 from converter_modules.com_integration.com_word_format_converter import convert_file_to_docx
-from core_components.generic_instruction.generic_instructions import format_document
+from core_components.generic_instruction.generic_instructions import apply_document_formatting, FORMATTING_DIRECT
 from common_func.folder_operations import delete_files_in_folder
+from common_func.document_pass_manager import DocumentPassManager
+from common_func import job_journal
+from common_func import result_cache
+from common_func import ocr_cache
+from common_func.image_preprocessing import DEFAULT_OCR_OPTIONS, ocr_settings_key
+from common_func.logo_index import logo_set_signature
 from core_components.jurisdictions.co  import co_region_main
 from converter_modules.abbyy_integration import abby_pdf_to_docx
+from converter_modules.text_layer_integration import pdf_text_to_docx
 
 logger = get_logger(__name__)
 
+# Limits applied while extracting input archives
+MAX_ZIP_DEPTH = 5                                   # nested ZIP levels below the root ZIP
+MAX_MEMBER_SIZE = 512 * 1024 * 1024                 # bytes for a single extracted member
+MAX_TOTAL_EXTRACT_SIZE = 4 * 1024 * 1024 * 1024     # bytes written for one root ZIP
+NESTED_ZIP_SPOOL_SIZE = 64 * 1024 * 1024            # nested ZIPs above this size spill to a temp file
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class ExtractionLimitError(Exception):
+    """Raised when an archive breaks the size, depth or path limits for extraction."""
+
+
+# File types picked up from an extracted ZIP
+SUPPORTED_EXTENSIONS = ('.pdf', '.doc', '.html', '.docx')
+
+
+class WorkItem(NamedTuple):
+    """A file found in an extracted ZIP, described well enough to schedule it without going back to disk."""
+    path: str
+    size: int
+    extension: str
+    jurisdiction: str
+    source_zip: str
+
+
+# Scratch directory owned by the current worker process when files are processed in parallel
+worker_process_path = None
+
+# Pool of file worker processes kept by this process between ZIPs, with the settings it was started with
+file_pool = None
+file_pool_settings = None
+
 def check_create_folder(base_folder_path):
     """
     Check if base folder exists, create it if not.
@@ -109,24 +152,86 @@ def extract_next_two_chars(filename, keyword):
     return next_two_chars
 
 
+def get_member_path(extract_to, member_name):
+    """Return the target path for a ZIP member, refusing names that escape the extraction folder."""
+    base_dir = os.path.abspath(extract_to)
+    target_path = os.path.abspath(os.path.join(base_dir, member_name))
+    if os.path.commonpath([base_dir, target_path]) != base_dir:
+        raise ExtractionLimitError(f"ZIP member escapes extraction folder: {member_name}")
+    return target_path
+
+
+def copy_member(source, destination, extracted_size):
+    """Copy an open ZIP member to a file object in chunks, enforcing the member and total size limits."""
+    member_size = 0
+    while True:
+        chunk = source.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+        member_size += len(chunk)
+        if member_size > MAX_MEMBER_SIZE:
+            raise ExtractionLimitError(f"ZIP member larger than {MAX_MEMBER_SIZE} bytes")
+        destination.write(chunk)
+    extracted_size[0] += member_size
+    if extracted_size[0] > MAX_TOTAL_EXTRACT_SIZE:
+        raise ExtractionLimitError(f"ZIP contents larger than {MAX_TOTAL_EXTRACT_SIZE} bytes")
+
+
+def iter_zip_members(zip_ref, extract_to, unprocessed_path, depth=0, extracted_size=None):
+    """
+    Stream the members of an open ZIP file to disk and yield each extracted file path as it is written.
+    Nested ZIP files are opened from memory (or a spooled temp file when large) and never written out.
+    """
+    if depth > MAX_ZIP_DEPTH:
+        raise ExtractionLimitError(f"Nested ZIP depth exceeds {MAX_ZIP_DEPTH}")
+    if extracted_size is None:
+        extracted_size = [0]
+
+    for info in zip_ref.infolist():
+        if info.is_dir():
+            continue
+        target_path = get_member_path(extract_to, info.filename)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+        if info.filename.lower().endswith('.zip'):
+            with tempfile.SpooledTemporaryFile(max_size=NESTED_ZIP_SPOOL_SIZE) as spool:
+                with zip_ref.open(info) as member:
+                    copy_member(member, spool, extracted_size)
+                spool.seek(0)
+
+                if zipfile.is_zipfile(spool):
+                    logger.info(f"Found nested ZIP file: {target_path}")
+                    nested_extract_to = os.path.splitext(target_path)[0]
+                    os.makedirs(nested_extract_to, exist_ok=True)
+                    try:
+                        with zipfile.ZipFile(spool) as nested_ref:
+                            yield from iter_zip_members(nested_ref, nested_extract_to, unprocessed_path,
+                                                        depth + 1, extracted_size)
+                        continue
+                    except zipfile.BadZipFile:
+                        logger.error(f"Bad ZIP file: {target_path}")
+                        target_path = os.path.join(unprocessed_path, datetime.now().strftime("%B_%d_%Y").upper(),
+                                                   os.path.basename(target_path))
+                        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                        logger.info(f"Moved bad ZIP file to: {os.path.dirname(target_path)}")
+
+                spool.seek(0)
+                with open(target_path, 'wb') as destination:
+                    shutil.copyfileobj(spool, destination, COPY_CHUNK_SIZE)
+            continue
+
+        with zip_ref.open(info) as member, open(target_path, 'wb') as destination:
+            copy_member(member, destination, extracted_size)
+        yield target_path
+
+
 def extract_zip(zip_path, extract_to, unprocessed_path):
     """Extract ZIP file and handle nested ZIP files."""
     logger.info(f"Extracting ZIP file: {zip_path} to {extract_to}")
     try:
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_to)
-            logger.info(f"Extracted {zip_path} to {extract_to}")
-
-            for root, dirs, files in os.walk(extract_to):
-                for file_name in files:
-                    if file_name.lower().endswith('.zip'):
-                        file_path = os.path.join(root, file_name)
-                        if zipfile.is_zipfile(file_path):
-                            logger.info(f"Found nested ZIP file: {file_path}")
-                            nested_extract_to = os.path.join(root, os.path.splitext(file_name)[0])
-                            os.makedirs(nested_extract_to, exist_ok=True)
-                            extract_zip(file_path, nested_extract_to, unprocessed_path)
-                            os.remove(file_path)
+            for file_path in iter_zip_members(zip_ref, extract_to, unprocessed_path):
+                logger.debug(f"Extracted {file_path}")
 
         logger.info(f"Completed extraction of {zip_path}")
     except zipfile.BadZipFile:
@@ -135,11 +240,68 @@ def extract_zip(zip_path, extract_to, unprocessed_path):
         os.makedirs(bad_zip_dir, exist_ok=True)
         shutil.move(zip_path, os.path.join(bad_zip_dir, os.path.basename(zip_path)))
         logger.info(f"Moved bad ZIP file to: {bad_zip_dir}")
+    except ExtractionLimitError as e:
+        logger.error(f"Extraction limit reached for {zip_path}: {e}")
+        raise
     except Exception as e:
         logger.error(f"An error occurred while extracting {zip_path}: {str(e)}")
 
 
-def process_file(file_path, jurisdiction, output_path, error_path, temp_path, process_path):
+def use_text_layer(pdf_options):
+    return bool(pdf_options and pdf_options.get('text_layer_fast_path'))
+
+
+def result_cache_settings(formatting_mode, ocr_options=None, pdf_options=None):
+    """Every option that changes the output of a file, as part of its result cache key."""
+    ocr_options = DEFAULT_OCR_OPTIONS if ocr_options is None else ocr_options
+    settings = (formatting_mode,) + (('text_layer',) if use_text_layer(pdf_options) else ())
+    settings += ocr_settings_key(ocr_options) + (f"ocr_engine={ocr_options.get('engine') or 'auto'}",
+                                                 f"logos={logo_set_signature(ocr_options.get('logo_dir'))}")
+    # Chunked conversions are merged from several ABBYY runs, so the chunking settings change the output
+    pdf_options = pdf_options or {}
+    settings += (f"abbyy_engines={pdf_options.get('abbyy_engines', abby_pdf_to_docx.ENGINE_POOL_SIZE)}",
+                 f"chunk_threshold={pdf_options.get('chunk_threshold', abby_pdf_to_docx.CHUNK_THRESHOLD)}",
+                 f"chunk_pages={pdf_options.get('chunk_pages', abby_pdf_to_docx.CHUNK_PAGES)}")
+    return settings
+
+
+def configure_pdf_engines(pdf_options=None):
+    """Size this process's pool of ABBYY engines from the PDF options; the engines load on first use."""
+    abby_pdf_to_docx.configure_engine_pool(size=(pdf_options or {}).get('abbyy_engines'))
+
+
+def convert_pdf_to_docx(file_path, output_path, pdf_options=None):
+    """
+    Convert a PDF to DOCX. Born-digital PDFs with a reliable text layer are built straight from it when the
+    text layer fast path is enabled; scanned and image-only PDFs, and any the fast path fails on, go to ABBYY,
+    which converts PDFs over the chunk threshold in page chunks.
+    """
+    if use_text_layer(pdf_options):
+        try:
+            report = pdf_text_to_docx.Run(file_path, output_path)
+            if report.reliable:
+                logger.info(f'Built DOCX from the PDF text layer, skipping OCR: {file_path}')
+                return
+            logger.info(f'Sending PDF to ABBYY, {report.reason}: {file_path}')
+        except Exception as e:
+            logger.warning(f'Text layer conversion failed for {file_path}, sending it to ABBYY: {e}')
+
+    pdf_options = pdf_options or {}
+    # Large PDFs are split into page chunks converted on all engines of this process's pool
+    abby_pdf_to_docx.Run(file_path=file_path, output_path=output_path,
+                         chunk_threshold=pdf_options.get('chunk_threshold', abby_pdf_to_docx.CHUNK_THRESHOLD),
+                         chunk_pages=pdf_options.get('chunk_pages', abby_pdf_to_docx.CHUNK_PAGES))
+
+
+def record_stage_pass(doc, journal_context, file_path, stage):
+    """Pass that records a journal stage once the passes registered before it have run; leaves the document unchanged."""
+    job_journal.record_stage(journal_context, file_path, stage)
+    return False
+
+
+def process_file(file_path, jurisdiction, output_path, error_path, temp_path, process_path, journal_context=None,
+                 cache_context=None, formatting_mode=FORMATTING_DIRECT, ocr_cache_context=None, ocr_options=None,
+                 pdf_options=None):
     """Process a single file based on its extension and jurisdiction."""
     delete_files_in_folder(process_path)
     region_code = jurisdiction.lower() 
@@ -153,10 +315,22 @@ def process_file(file_path, jurisdiction, output_path, error_path, temp_path, pr
     # Get base filename without extension
     base_filename = os.path.splitext(os.path.basename(file_path))[0]
     process_docx_path = os.path.join(process_path, f"{base_filename}.docx")
+    output_file_path = os.path.join(output_dir, f"{base_filename}.doc")
+
+    # Reuse the output of an identical earlier submission when it is cached
+    cache = result_cache.open_result_cache(cache_context)
+    settings = result_cache_settings(formatting_mode, ocr_options, pdf_options)
+    cache_key = result_cache.compute_cache_key(file_path, jurisdiction, settings=settings) if cache else None
+    if cache and cache.get(cache_key, output_file_path):
+        logger.info(f"Result cache hit, copied cached output to: {output_file_path}")
+        job_journal.record_stage(journal_context, file_path, 'written')
+        os.remove(file_path)
+        logger.info(f"Original file deleted: {file_path}")
+        return
 
     # Convert files to docx format based on file extension
     if file_path.lower().endswith('.pdf'):
-        abby_pdf_to_docx.Run(file_path=file_path, output_path=process_docx_path)
+        convert_pdf_to_docx(file_path, process_docx_path, pdf_options)
         logger.info(f'Converted PDF to DOCX: {process_docx_path}')
 
     elif file_path.lower().endswith('.doc'):
@@ -166,7 +340,11 @@ def process_file(file_path, jurisdiction, output_path, error_path, temp_path, pr
     elif file_path.lower().endswith('.docx'):
         shutil.copy2(file_path, process_docx_path)
         logger.info(f'Copied DOCX file to process directory: {process_docx_path}')
+    job_journal.record_stage(journal_context, file_path, 'converted')
     
+    # The document is loaded once; jurisdiction rules and generic formatting run on it in memory
+    passes = DocumentPassManager(process_docx_path)
+
     # Process based on jurisdiction
     if jurisdiction.lower() == "ca":
         pass  # CA processing code commented out
@@ -174,18 +352,30 @@ def process_file(file_path, jurisdiction, output_path, error_path, temp_path, pr
         if file_path.lower().endswith('.html'):
             HTMLtoWord.HTMLtoWord(file_path, process_docx_path)
         elif os.path.splitext(file_path)[1].strip().lower() in ['.pdf', '.doc', '.docx']:
-            co_region_main.main_co_files(
+            co_region_main.register_co_passes(
+                passes,
                 input_docx_path=process_docx_path,
-                source_file_path=file_path
+                source_file_path=file_path,
+                ocr_cache_context=ocr_cache_context,
+                ocr_options=ocr_options
             )
     
+    passes.register('rules_applied', record_stage_pass, journal_context, file_path, 'rules_applied')
+
     # Apply generic formatting rules
-    format_document(doc_path=process_docx_path, region_code=region_code)
+    passes.register('format_document', apply_document_formatting, region_code=region_code, mode=formatting_mode)
+    passes.run()
+    job_journal.record_stage(journal_context, file_path, 'formatted')
     
     # Move processed file to output folder (as .doc)
-    output_file_path = os.path.join(output_dir, f"{base_filename}.doc")
     shutil.move(process_docx_path, output_file_path)
     logger.info(f"Moved processed file to: {output_file_path}")
+    job_journal.record_stage(journal_context, file_path, 'written')
+    if cache:
+        try:
+            cache.put(cache_key, output_file_path)
+        except Exception as e:
+            logger.warning(f"Unable to cache result for {file_path}: {e}")
 
     # Clean up original file
     if os.path.exists(file_path):
@@ -201,38 +391,202 @@ def process_file(file_path, jurisdiction, output_path, error_path, temp_path, pr
     time.sleep(3)
 
 
-def loop_through_folders(base_directory, jurisdiction, output_path, error_path, temp_path, process_path):
-    """Loop through folders and process PDF, DOC, and ZIP files."""
+def move_to_exception_folder(file_path):
+    """Move a file that failed processing to the Exception folder of its output directory."""
+    output_dir = os.path.join("C:\\File\\NETSCAN\\Output", os.path.basename(os.path.dirname(file_path)))
+    exception_dir = os.path.join(output_dir, "Exception")
+    os.makedirs(exception_dir, exist_ok=True)
+
+    exception_file = os.path.join(exception_dir, os.path.basename(file_path))
+    shutil.move(file_path, exception_file)
+    logger.info(f'Moved file to exception directory: {exception_file}')
+
+
+def process_file_safely(file_path, jurisdiction, output_path, error_path, temp_path, process_path, journal_context=None,
+                        cache_context=None, formatting_mode=FORMATTING_DIRECT, ocr_cache_context=None, ocr_options=None,
+                        pdf_options=None):
+    """Process a single file, moving it to the Exception folder if processing fails."""
+    try:
+        process_file(file_path, jurisdiction, output_path, error_path, temp_path, process_path, journal_context,
+                     cache_context, formatting_mode, ocr_cache_context, ocr_options, pdf_options)
+        return True
+    except Exception as e:
+        logger.error(f'Error processing file {file_path}: {e}')
+        move_to_exception_folder(file_path)
+        return False
+
+
+def init_process_worker(process_path, pdf_options=None):
+    """Create an isolated scratch directory inside the process folder for this worker process and size its ABBYY engine pool."""
+    global worker_process_path
+    configure_pdf_engines(pdf_options)
+    os.makedirs(process_path, exist_ok=True)
+    worker_process_path = tempfile.mkdtemp(prefix='worker_', dir=process_path)
+    logger.info(f'Worker {os.getpid()} using process directory: {worker_process_path}')
+
+
+def process_file_in_worker(file_path, jurisdiction, output_path, error_path, temp_path, journal_context=None,
+                           cache_context=None, formatting_mode=FORMATTING_DIRECT, ocr_cache_context=None,
+                           ocr_options=None, pdf_options=None):
+    """Entry point for a pooled worker, processing the file in the worker's own scratch directory."""
+    return process_file_safely(file_path, jurisdiction, output_path, error_path, temp_path, worker_process_path,
+                               journal_context, cache_context, formatting_mode, ocr_cache_context, ocr_options,
+                               pdf_options)
+
+
+def get_file_pool(workers, process_path, pdf_options=None):
+    """
+    Return this process's pool of file worker processes, starting it on first use. The pool is kept between
+    ZIPs so its workers keep their ABBYY and Word engines loaded, and is replaced when its settings change.
+    """
+    global file_pool, file_pool_settings
+    settings = (workers, process_path, dict(pdf_options or {}))
+    if file_pool is not None and settings == file_pool_settings:
+        return file_pool
+    shutdown_file_pool()
+    if file_pool_settings is None:
+        # Registered with multiprocessing rather than atexit so that it also runs in ZIP worker processes,
+        # before they wait for their own child processes to exit, and before the pool's queues are closed
+        multiprocessing_util.Finalize(None, shutdown_file_pool, exitpriority=20)
+    file_pool = ProcessPoolExecutor(max_workers=workers, initializer=init_process_worker,
+                                    initargs=(process_path, pdf_options))
+    file_pool_settings = settings
+    return file_pool
+
+
+def shutdown_file_pool():
+    """Stop this process's file worker processes and remove their scratch directories."""
+    global file_pool
+    if file_pool is None:
+        return
+    try:
+        file_pool.shutdown()
+    finally:
+        file_pool = None
+        remove_worker_folders(file_pool_settings[1])
+
+
+def remove_worker_folders(process_path):
+    """Remove the scratch directories left behind by worker processes."""
+    for entry in os.listdir(process_path):
+        worker_dir = os.path.join(process_path, entry)
+        if entry.startswith('worker_') and os.path.isdir(worker_dir):
+            shutil.rmtree(worker_dir, ignore_errors=True)
+
+
+def get_worker_count(workers):
+    """Resolve the configured worker count, where 0 or less means one worker per CPU core."""
+    if workers is None:
+        return 1
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def build_work_manifest(base_directory, jurisdiction, source_zip):
+    """
+    Scan the extracted folder tree in a single os.scandir pass and return the supported files as work items.
+    Folders are visited top-down and entries in name order, so the manifest order is stable.
+    """
+    manifest = []
+    pending_dirs = [base_directory]
+    while pending_dirs:
+        directory = pending_dirs.pop()
+        sub_dirs = []
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.is_dir(follow_symlinks=False):
+                    sub_dirs.append(entry.path)
+                    continue
+                extension = os.path.splitext(entry.name)[1].lower()
+                if extension in SUPPORTED_EXTENSIONS and entry.is_file():
+                    manifest.append(WorkItem(entry.path, entry.stat().st_size, extension, jurisdiction, source_zip))
+        # Reversed so that sub folders are popped in name order
+        pending_dirs.extend(reversed(sub_dirs))
+    return manifest
+
+
+def log_result_cache_stats(cache_context):
+    """Log the result cache counters, which are shared by all worker processes."""
+    cache = result_cache.open_result_cache(cache_context)
+    if cache:
+        stats = cache.stats()
+        logger.info(f"Result cache hits: {stats['hits']}, misses: {stats['misses']}, hit rate: {stats['hit_rate']:.1%}")
+
+
+def log_ocr_cache_stats(ocr_cache_context):
+    """Log the OCR cache counters, which are shared by all worker processes."""
+    cache = ocr_cache.open_ocr_cache(ocr_cache_context)
+    if cache:
+        stats = cache.stats()
+        logger.info(f"OCR cache hits: {stats['hits']}, misses: {stats['misses']}, hit rate: {stats['hit_rate']:.1%}, "
+                    f"logo matches: {stats['logo_hits']}, skipped images: {stats['skipped_images']}")
+
+
+def loop_through_folders(base_directory, jurisdiction, output_path, error_path, temp_path, process_path, options=None,
+                         source_zip=None, journal_context=None):
+    """Loop through folders and process PDF, DOC, DOCX and HTML files."""
     logger.info(f"Looping through folders in base directory: {base_directory}")
+    options = options or {}
     
     if not os.listdir(base_directory):
         os.rmdir(base_directory)
         raise OSError('No files present in folder')
 
-    file_patterns = ["*.pdf", "*.doc", "*.html", "*.docx"]
-    
-    # Recursively loop through directories
-    for root, dirs, files in os.walk(base_directory):
-        for pattern in file_patterns:
-            # Generate file paths matching the pattern
-            for file_path in glob.glob(os.path.join(root, pattern)):
-                logger.info(f'Found file: {file_path}')
-
-                try:
-                    process_file(file_path, jurisdiction, output_path, error_path, temp_path, process_path)
-                except Exception as e:
-                    logger.error(f'Error processing file {file_path}: {e}')
-                    # Move file to exception directory
-                    output_dir = os.path.join("C:\\File\\NETSCAN\\Output", os.path.basename(os.path.dirname(file_path)))
-                    exception_dir = os.path.join(output_dir, "Exception")
-                    os.makedirs(exception_dir, exist_ok=True)
-                    
-                    exception_file = os.path.join(exception_dir, os.path.basename(file_path))
-                    shutil.move(file_path, exception_file)
-                    logger.info(f'Moved file to exception directory: {exception_file}')
-
-
-def Input_Extract(input_path, output_path, error_path, temp_path, process_path, unprocessed_path):
+    manifest = build_work_manifest(base_directory, jurisdiction, source_zip or base_directory)
+    if journal_context:
+        # Skip files whose output was written before an interrupted run stopped
+        journal = job_journal.open_journal(journal_context[0])
+        written = journal.get_written_members(journal_context[1])
+        manifest = [item for item in manifest if item.path not in written]
+        journal.register_members(journal_context[1], [item.path for item in manifest])
+
+    cache_context = None
+    if options.get('result_cache_path'):
+        cache_context = (options['result_cache_path'], options.get('result_cache_max_bytes', 0))
+    formatting_mode = options.get('formatting_mode', FORMATTING_DIRECT)
+    ocr_cache_context = None
+    if options.get('ocr_cache_path'):
+        ocr_cache_context = (options['ocr_cache_path'], options.get('ocr_cache_max_bytes', 0))
+    ocr_options = options.get('ocr_options')
+    pdf_options = options.get('pdf_options')
+
+    for item in manifest:
+        logger.info(f'Found file: {item.path} ({item.size} bytes)')
+
+    workers = get_worker_count(options.get('file_workers'))
+    if workers <= 1 or not manifest:
+        configure_pdf_engines(pdf_options)
+        for item in manifest:
+            process_file_safely(item.path, jurisdiction, output_path, error_path, temp_path, process_path,
+                                journal_context, cache_context, formatting_mode, ocr_cache_context, ocr_options,
+                                pdf_options)
+        log_result_cache_stats(cache_context)
+        log_ocr_cache_stats(ocr_cache_context)
+        return
+
+    # Largest files first so that one long file does not start last and hold up the batch
+    scheduled = sorted(manifest, key=lambda item: item.size, reverse=True)
+    logger.info(f'Processing {len(manifest)} files with up to {workers} worker processes')
+    executor = get_file_pool(workers, process_path, pdf_options)
+    try:
+        futures = [
+            executor.submit(process_file_in_worker, item.path, jurisdiction, output_path, error_path, temp_path,
+                            journal_context, cache_context, formatting_mode, ocr_cache_context, ocr_options,
+                            pdf_options)
+            for item in scheduled
+        ]
+        for future in futures:
+            future.result()
+    except BrokenProcessPool:
+        # A worker process died, so the pool cannot take more files; the next ZIP starts a new one
+        shutdown_file_pool()
+        raise
+    log_result_cache_stats(cache_context)
+    log_ocr_cache_stats(ocr_cache_context)
+
+
+def Input_Extract(input_path, output_path, error_path, temp_path, process_path, unprocessed_path, options=None):
     """Extract and process files from input ZIP file."""
     jurisdiction = ""
 
@@ -243,12 +597,32 @@ def Input_Extract(input_path, output_path, error_path, temp_path, process_path,
         base_name = os.path.splitext(os.path.basename(input_path))[0]
         output_dir = os.path.join(os.path.dirname(input_path), base_name)
 
-        # Ensure the output directory exists
-        os.makedirs(output_dir, exist_ok=True)
+        # Journal the job so an interrupted run resumes instead of starting over
+        journal = None
+        journal_context = None
+        zip_status = None
+        journal_path = (options or {}).get('journal_path')
+        if journal_path:
+            journal = job_journal.open_journal(journal_path)
+            zip_key = job_journal.get_zip_key(input_path)
+            zip_status = journal.start_zip(zip_key, os.path.basename(input_path))
+            journal_context = (journal_path, zip_key)
+
+        if zip_status == job_journal.ZIP_EXTRACTED and os.path.isdir(output_dir):
+            logger.info(f"Resuming {input_path}, skipping extraction into existing folder: {output_dir}")
+        else:
+            # Ensure the output directory exists
+            os.makedirs(output_dir, exist_ok=True)
+
+            # Start extraction process
+            extract_zip(input_path, output_dir, unprocessed_path)
+            if journal:
+                journal.set_zip_status(journal_context[1], job_journal.ZIP_EXTRACTED)
 
-        # Start extraction process
-        extract_zip(input_path, output_dir, unprocessed_path)
-        loop_through_folders(output_dir, jurisdiction, output_path, error_path, temp_path, process_path)
+        loop_through_folders(output_dir, jurisdiction, output_path, error_path, temp_path, process_path, options,
+                             source_zip=input_path, journal_context=journal_context)
         shutil.rmtree(output_dir)
+        if journal:
+            journal.set_zip_status(journal_context[1], job_journal.ZIP_COMPLETED)
     else:
         logger.warning(f"Input path does not end with .zip: {input_path}")
\ No newline at end of file
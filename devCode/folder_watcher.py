@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import select
+import ctypes
+import ctypes.util
+import zipfile
+from logs.logs_handler import get_logger
+
+logger = get_logger(__name__)
+
+# inotify event masks (see <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+
+class PollingWatcher:
+    """Fallback watcher that simply sleeps for the poll interval between folder scans."""
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Wakes up as soon as a file is created, written or moved into the folder (Linux only)."""
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        watch = libc.inotify_add_watch(self.fd, os.fsencode(folder_path), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if watch < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {folder_path}')
+
+    def wait(self, timeout):
+        """Block until an event arrives or the timeout expires, then drain the pending events."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+def create_watcher(folder_path):
+    """Use inotify on Linux and fall back to polling elsewhere or when inotify is unavailable."""
+    if sys.platform.startswith('linux'):
+        try:
+            watcher = InotifyWatcher(folder_path)
+            logger.info(f'Watching {folder_path} with inotify')
+            return watcher
+        except (OSError, AttributeError) as e:
+            logger.warning(f'inotify unavailable, falling back to polling: {e}')
+    logger.info(f'Watching {folder_path} by polling')
+    return PollingWatcher(folder_path)
+
+
+def scan_zip_files(folder_path):
+    """Return {filename: (size, mtime, ctime)} for the zip files currently in the folder."""
+    zip_files = {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith('.zip') and entry.is_file():
+                stat = entry.stat()
+                zip_files[entry.name] = (stat.st_size, stat.st_mtime, stat.st_ctime)
+    return zip_files
+
+
+def is_zip_complete(zip_path):
+    """A partially copied ZIP has no central directory yet, so it is not a valid ZIP file."""
+    try:
+        return zipfile.is_zipfile(zip_path)
+    except OSError:
+        return False
+
+
+def watch_input_folder(folder_path, handle_zip, poll_interval=2.0, settle_seconds=5.0, should_stop=None):
+    """
+    Watch the input folder and call handle_zip(filename) for every ZIP once it is completely written.
+    A ZIP counts as complete when its size and modification time have not changed for settle_seconds
+    and it can be read as a ZIP file. Each version of a file is handed over only once.
+    """
+    watcher = create_watcher(folder_path)
+    observed = {}       # filename -> (size, mtime, first time this size/mtime was seen)
+    dispatched = {}     # filename -> (size, mtime) that was handed over
+
+    try:
+        while not (should_stop and should_stop()):
+            now = time.monotonic()
+            zip_files = scan_zip_files(folder_path)
+
+            # Forget files that have been moved out of the input folder
+            for filename in list(observed):
+                if filename not in zip_files:
+                    observed.pop(filename, None)
+                    dispatched.pop(filename, None)
+
+            # Hand over complete files in creation time order
+            for filename in sorted(zip_files, key=lambda name: zip_files[name][2]):
+                size, mtime, _ = zip_files[filename]
+                signature = (size, mtime)
+                if dispatched.get(filename) == signature:
+                    continue
+
+                previous = observed.get(filename)
+                if previous is None or previous[:2] != signature:
+                    observed[filename] = (size, mtime, now)
+                    continue
+
+                if now - previous[2] < settle_seconds:
+                    continue
+                if not is_zip_complete(os.path.join(folder_path, filename)):
+                    logger.debug(f'Waiting for {filename} to be completely written')
+                    continue
+
+                logger.info(f'New zip file ready: {filename}')
+                dispatched[filename] = signature
+                handle_zip(filename)
+
+            # Wake up early for new events, but re-check pending files once they have settled
+            timeout = min(poll_interval, settle_seconds) if len(observed) > len(dispatched) else poll_interval
+            watcher.wait(timeout)
+    finally:
+        watcher.close()
@@ -1,10 +1,15 @@
 import os
 # import logging
+import argparse
 import configparser
 import shutil
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import extract_input
+import folder_watcher
+from converter_modules.abbyy_integration import abby_pdf_to_docx
+from common_func.folder_operations import move_file_atomic
 from logs.logs_handler import get_logger
 
 logger = get_logger(__name__)
@@ -52,13 +57,28 @@ def get_sorted_zip_files(directory):
     return sorted_files
 
 
+def create_job_workspace(filename, config_paths):
+    """Create temp and process folders that belong to a single zip job"""
+    job_name = os.path.splitext(filename)[0]
+    job_temp_path = os.path.join(config_paths['temp'], job_name)
+    job_process_path = os.path.join(config_paths['process'], job_name)
+    os.makedirs(job_temp_path, exist_ok=True)
+    os.makedirs(job_process_path, exist_ok=True)
+    return job_temp_path, job_process_path
+
+
+def remove_job_workspace(filename, config_paths):
+    """Remove the temp and process folders of a finished zip job"""
+    job_name = os.path.splitext(filename)[0]
+    for folder in (config_paths['temp'], config_paths['process']):
+        shutil.rmtree(os.path.join(folder, job_name), ignore_errors=True)
+
+
 def process_zip_file(filename, config_paths):
     """Process a single zip file"""
     input_path = config_paths['input']
     output_path = config_paths['output']
     error_path = config_paths['error']
-    temp_path = config_paths['temp']
-    process_path = config_paths['process']
     archive_path = config_paths['archive']
     unprocessed_path = config_paths['unprocessed']
     
@@ -66,6 +86,7 @@ def process_zip_file(filename, config_paths):
     
     try:            
         logger.info(f'** Started Processing file: {filename} **')
+        temp_path, process_path = create_job_workspace(filename, config_paths)
         delete_all_files([temp_path, process_path]) 
 
         logger.info("File extraction started from input path")
@@ -75,13 +96,13 @@ def process_zip_file(filename, config_paths):
             error_path,
             temp_path,
             process_path,
-            unprocessed_path
+            unprocessed_path,
+            options=config_paths
         )
         logger.info("File extraction completed")
         
-        # Create archive subfolder and move file
-        os.makedirs(os.path.join(archive_path, sub_output_folder), exist_ok=True)
-        shutil.move(
+        # Move file to archive subfolder
+        move_file_atomic(
             os.path.join(input_path, filename), 
             os.path.join(archive_path, sub_output_folder)
         )
@@ -93,14 +114,70 @@ def process_zip_file(filename, config_paths):
         return False
     except Exception as e:
         logger.error(f'Error processing file {filename}: {e}')
-        os.makedirs(os.path.join(unprocessed_path, sub_output_folder), exist_ok=True)
         # Move file to unprocessed folder
-        shutil.move(
+        move_file_atomic(
             os.path.join(input_path, filename),
             os.path.join(unprocessed_path, sub_output_folder)
         )
         logger.info(f'ErrorFile {filename} moved to {os.path.join(unprocessed_path, sub_output_folder)}')
         return False
+    finally:
+        remove_job_workspace(filename, config_paths)
+
+
+def process_zip_files(sorted_files, config_paths):
+    """Process zip files, running up to the configured number of zip jobs at the same time.
+
+    Jobs are submitted in creation time order so they start in that order, but may finish in any order.
+    """
+    zip_workers = config_paths.get('zip_workers', 1)
+    if zip_workers <= 1 or len(sorted_files) <= 1:
+        for filename in sorted_files:
+            process_zip_file(filename, config_paths)
+        return
+
+    logger.info(f'Processing {len(sorted_files)} zip files with {zip_workers} concurrent jobs')
+    with ProcessPoolExecutor(max_workers=zip_workers) as executor:
+        futures = {
+            executor.submit(process_zip_file, filename, config_paths): filename
+            for filename in sorted_files
+        }
+        for future in as_completed(futures):
+            log_zip_job_result(futures[future], future)
+
+
+def log_zip_job_result(filename, future):
+    """Log the outcome of a zip job that ran in a worker process"""
+    try:
+        processed = future.result()
+        logger.info(f'Zip job finished: {filename} (processed={processed})')
+    except Exception as e:
+        logger.error(f'Zip job failed: {filename}: {e}')
+
+
+def run_watch_mode(config_paths):
+    """Keep running and process each zip file as soon as it is completely written to the input folder.
+
+    Zip jobs run in long-lived worker processes, each keeping its pool of file worker processes between zip jobs,
+    so imports and conversion engines stay warm between files.
+    """
+    zip_workers = max(1, config_paths.get('zip_workers', 1))
+    logger.info(f"Starting watch mode on {config_paths['input']} with {zip_workers} zip workers")
+
+    with ProcessPoolExecutor(max_workers=zip_workers) as executor:
+        def submit_zip(filename):
+            future = executor.submit(process_zip_file, filename, config_paths)
+            future.add_done_callback(lambda f: log_zip_job_result(filename, f))
+
+        try:
+            folder_watcher.watch_input_folder(
+                config_paths['input'],
+                submit_zip,
+                poll_interval=config_paths.get('watch_poll_interval', 2.0),
+                settle_seconds=config_paths.get('watch_settle_seconds', 5.0)
+            )
+        except KeyboardInterrupt:
+            logger.info('Watch mode stopped, waiting for running zip jobs to finish')
 
 
 def load_config(config_path='devCode/config/config.ini'):
@@ -108,6 +185,7 @@ def load_config(config_path='devCode/config/config.ini'):
     config = configparser.ConfigParser()
     config.read(config_path)
     
+    root_path = config.get('general', 'rootpath')
     return {
         'unprocessed': config.get('general', 'unprocessed'),
         'input': config.get('general', 'inputpath'),
@@ -116,7 +194,31 @@ def load_config(config_path='devCode/config/config.ini'):
         'temp': config.get('general', 'temppath'),
         'process': config.get('general', 'processpath'),
         'archive': config.get('general', 'archive'),
-        'root': config.get('general', 'rootpath')
+        'root': root_path,
+        'file_workers': config.getint('processing', 'fileworkers', fallback=1),
+        'zip_workers': config.getint('processing', 'zipworkers', fallback=1),
+        'journal_path': config.get('processing', 'journalpath', fallback=os.path.join(root_path, 'journal.db')),
+        'result_cache_path': config.get('cache', 'resultcachepath', fallback=os.path.join(root_path, 'cache', 'results')),
+        'result_cache_max_bytes': config.getint('cache', 'resultcachemaxmb', fallback=2048) * 1024 * 1024,
+        'ocr_cache_path': config.get('cache', 'ocrcachepath', fallback=os.path.join(root_path, 'cache', 'ocr.db')),
+        'ocr_cache_max_bytes': config.getint('cache', 'ocrcachemaxmb', fallback=64) * 1024 * 1024,
+        'ocr_options': {
+            'preprocess': config.getboolean('ocr', 'preprocess', fallback=False),
+            'target_dpi': config.getint('ocr', 'targetdpi', fallback=300),
+            'binarize': config.getboolean('ocr', 'binarize', fallback=False),
+            'crop_text_band': config.getboolean('ocr', 'croptextband', fallback=False),
+            'engine': config.get('ocr', 'engine', fallback='auto'),
+            'logo_dir': config.get('ocr', 'logodir', fallback=''),
+        },
+        'pdf_options': {
+            'text_layer_fast_path': config.getboolean('pdf', 'textlayerfastpath', fallback=False),
+            'abbyy_engines': config.getint('pdf', 'abbyyengines', fallback=abby_pdf_to_docx.ENGINE_POOL_SIZE),
+            'chunk_threshold': config.getint('pdf', 'chunkthreshold', fallback=abby_pdf_to_docx.CHUNK_THRESHOLD),
+            'chunk_pages': config.getint('pdf', 'chunkpages', fallback=abby_pdf_to_docx.CHUNK_PAGES),
+        },
+        'formatting_mode': config.get('formatting', 'mode', fallback='direct').strip().lower(),
+        'watch_poll_interval': config.getfloat('watch', 'pollinterval', fallback=2.0),
+        'watch_settle_seconds': config.getfloat('watch', 'settleseconds', fallback=5.0)
     }
 
 
@@ -130,19 +232,25 @@ def load_config(config_path='devCode/config/config.ini'):
 if __name__ == '__main__':
     """Main entry point of the program"""
     # setup_logging()
+    parser = argparse.ArgumentParser(description='NETSCAN document conversion')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and process zip files as soon as they arrive in the input folder')
+    args = parser.parse_args()
     
     logger.info('Initializing the config')
     config_paths = load_config()
     
     try:
         extract_input.check_create_folder(config_paths['root'])
-        
-        # Get sorted zip files
-        sorted_files = get_sorted_zip_files(config_paths['input'])
-        
-        # Process each file
-        for filename in sorted_files:
-            process_zip_file(filename, config_paths)
+
+        if args.watch:
+            run_watch_mode(config_paths)
+        else:
+            # Get sorted zip files
+            sorted_files = get_sorted_zip_files(config_paths['input'])
+            
+            # Process each file
+            process_zip_files(sorted_files, config_paths)
             
     except Exception as e:
         logger.error(f"An error occurred: {e}")
@@ -0,0 +1,100 @@
+"""
+Behaviour of the paragraph text rules applied by format_paragraph_runs.
+
+    python -m pytest devCode/tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from core_components.generic_instruction.text_normalizer import normalize_paragraph_text, excluded_run_indexes
+
+
+@pytest.mark.parametrize('texts, expected', [
+    (['– § ° • ✓ ☒ →'], ['~#8211; ~#167; ~#176; ~#8226; / [x] -->']),
+    (['don', "'t"], ['don', '’t']),
+])
+def test_replacements_are_applied(texts, expected):
+    assert normalize_paragraph_text(texts) == expected
+
+
+@pytest.mark.parametrize('texts, expected', [
+    (['a ,b'], ['a,b']),
+    (['a', ' ,b'], ['a', ',b']),
+    (['a ', ',b'], ['a', ',b']),
+])
+def test_space_before_comma_is_removed_across_runs(texts, expected):
+    assert normalize_paragraph_text(texts) == expected
+
+
+@pytest.mark.parametrize('texts, expected', [
+    (['"Hello"'], ['“Hello”']),
+    (['("quoted")'], ['(“quoted”)']),
+    # A quote at a run boundary sees the word in the next run
+    (['He said "', 'Hello" today'], ['He said “', 'Hello” today']),
+    (['say "', 'hi', '"'], ['say “', 'hi', '”']),
+    # A quote ending a run that no rule matches is closed, as when runs were normalized one by one
+    (['"', '"'], ['”', '”']),
+    (['"', ''], ['”', '']),
+    # Within one run such a quote stays straight, as before
+    (['x "" y'], ['x "” y']),
+])
+def test_quote_direction(texts, expected):
+    assert normalize_paragraph_text(texts) == expected
+
+
+@pytest.mark.parametrize('texts', [[], [''], ['plain text'], ['already “curly” and ’'], ['one', ' two, ', 'three']])
+def test_conforming_text_is_unchanged(texts):
+    assert normalize_paragraph_text(texts) == texts
+
+
+@pytest.mark.parametrize('texts, expected', [
+    (['none here'], []),
+    (['mail ', 'a@b', '.com now'], [1, 2]),
+    (['see ', 'www.example.org', ' for more'], [1]),
+    (['', 'a@b.com'], [1]),
+    (['rule.pdf', ' and ', 'form.docx'], [0, 2]),
+])
+def test_excluded_run_indexes(texts, expected):
+    assert excluded_run_indexes(texts) == expected
+
+
+def format_paragraph_runs(p):
+    # generic_instructions needs comtypes, which only installs on Windows
+    generic_instructions = pytest.importorskip('core_components.generic_instruction.generic_instructions')
+    generic_instructions.format_paragraph_runs(p, format_font=lambda r: None)
+
+
+def make_paragraph(*texts):
+    """A w:p with a run per text; None adds a run holding only an image."""
+    paragraph = Document().add_paragraph()
+    for text in texts:
+        run = paragraph.add_run()
+        if text is None:
+            run._r.append(OxmlElement('w:drawing'))
+        else:
+            run.text = text
+    return paragraph._p
+
+
+def run_texts(p):
+    return [''.join(t.text or '' for t in r.iter(qn('w:t'))) for r in p.iterchildren(qn('w:r'))]
+
+
+def test_image_runs_are_skipped():
+    p = make_paragraph('He said "', None, 'Hello" today')
+    format_paragraph_runs(p)
+    # The quote before the image opens the word after it; the image run is left as it was
+    assert run_texts(p) == ['He said “', '', 'Hello” today']
+    assert p.findall('.//' + qn('w:drawing'))
+
+
+def test_image_between_quotes():
+    p = make_paragraph('"', None, '"')
+    format_paragraph_runs(p)
+    assert run_texts(p) == ['”', '', '”']